@@ -0,0 +1,155 @@
+"""
+Handler latency benchmark: blocking pymongo calls vs the async Database.
+
+Simulates N concurrent users each sending one file. Every simulated
+handler performs the same database round-trips as handle_file_rename
+(ban check, format, prefix, suffix, counter update) and the time from
+dispatch to completion is recorded per handler.
+
+By default both runs go through the real Database layer on top of an
+in-memory backend that adds a fixed round-trip time to every call. The
+"before" backend waits with time.sleep, as the blocking pymongo driver
+did. The "after" backend awaits asyncio.sleep, as motor does. The
+benchmark runs anywhere:
+
+    python benchmarks/db_latency.py --users 500 --rtt-ms 2
+
+Pass --mongo to run the same workload against the DB_URL from .env,
+using pymongo for the "before" run and the async Database for "after".
+"""
+
+import argparse
+import asyncio
+import inspect
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+QUERIES_PER_HANDLER = 5
+
+
+def percentile(values, pct):
+    """Return the pct-th percentile of values"""
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def run_users(handler, users):
+    """Dispatch one handler per user at once and collect latencies in ms"""
+    latencies = []
+    dispatched = time.perf_counter()
+    
+    async def timed(user_id):
+        await handler(user_id)
+        latencies.append((time.perf_counter() - dispatched) * 1000)
+    
+    await asyncio.gather(*(timed(user_id) for user_id in range(users)))
+    return latencies
+
+
+def latency_backend(rtt, blocking):
+    """In-memory backend whose every call takes rtt, blocking the event loop if blocking"""
+    from storage.base import StorageBackend
+    from storage.memory import MemoryBackend
+    
+    def delayed(method):
+        async def wrapper(self, *args, **kwargs):
+            if blocking:
+                time.sleep(rtt)
+            else:
+                await asyncio.sleep(rtt)
+            return await method(self, *args, **kwargs)
+        return wrapper
+    
+    methods = {
+        name: delayed(getattr(MemoryBackend, name))
+        for name in StorageBackend.__abstractmethods__
+        if inspect.iscoroutinefunction(getattr(MemoryBackend, name))
+    }
+    return type("LatencyBackend", (MemoryBackend,), methods)()
+
+
+async def simulated_handlers(rtt):
+    """Handlers running the Database calls of a rename against simulated round-trips"""
+    from database import Database
+    
+    databases = []
+    for blocking in (True, False):
+        database = Database(latency_backend(rtt, blocking))
+        await database.connect()
+        databases.append(database)
+    
+    def handler(database):
+        async def rename(user_id):
+            database.is_user_banned(user_id)
+            await database.get_user(user_id)
+            await database.get_rename_format(user_id)
+            await database.get_prefix(user_id)
+            await database.get_suffix(user_id)
+            await database.increment_rename_count(user_id)
+        return rename
+    
+    return handler(databases[0]), handler(databases[1])
+
+
+async def mongo_handlers():
+    """Handlers backed by the real database from DB_URL"""
+    from pymongo import MongoClient
+    from database import Database
+    from storage import create_backend
+    
+    sync_db = MongoClient(os.getenv("DB_URL"))[os.getenv("DATABASE_NAME", "file_rename_bot")]
+    async_db = Database(create_backend("mongo"))
+    if not await async_db.connect():
+        raise SystemExit("Could not connect to DB_URL")
+    
+    async def blocking(user_id):
+        sync_db["users"].find_one({"user_id": user_id})
+        sync_db["rename_formats"].find_one({"user_id": user_id})
+        sync_db["affixes"].find_one({"user_id": user_id})
+        sync_db["affixes"].find_one({"user_id": user_id})
+        sync_db["users"].update_one({"user_id": user_id}, {"$inc": {"rename_count": 0}})
+    
+    async def non_blocking(user_id):
+        await async_db.get_user(user_id)
+        await async_db.get_rename_format(user_id)
+        await async_db.get_prefix(user_id)
+        await async_db.get_suffix(user_id)
+        await async_db.backend.db["users"].update_one({"user_id": user_id}, {"$inc": {"rename_count": 0}})
+    
+    return blocking, non_blocking
+
+
+def report(label, latencies):
+    print(
+        f"{label:<10} p50={percentile(latencies, 50):9.1f} ms  "
+        f"p99={percentile(latencies, 99):9.1f} ms  "
+        f"mean={statistics.mean(latencies):9.1f} ms"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--rtt-ms", type=float, default=2.0)
+    parser.add_argument("--mongo", action="store_true")
+    args = parser.parse_args()
+    
+    if args.mongo:
+        from dotenv import load_dotenv
+        load_dotenv()
+        blocking, non_blocking = await mongo_handlers()
+    else:
+        blocking, non_blocking = await simulated_handlers(args.rtt_ms / 1000)
+    
+    print(f"{args.users} concurrent users, {QUERIES_PER_HANDLER} database calls per handler")
+    report("before", await run_users(blocking, args.users))
+    report("after", await run_users(non_blocking, args.users))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
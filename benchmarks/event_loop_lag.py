@@ -0,0 +1,100 @@
+"""
+Event-loop lag while thumbnails are resized.
+
+Resizes N photo-sized images concurrently with thumbnails.resize_thumbnail
+while a ticker measures how late the event loop wakes it up. Each mode
+reports the worst and p99 lag (what every other handler would wait)
+and the wall time to finish all thumbnails:
+
+    python benchmarks/event_loop_lag.py --images 50
+
+Modes: "inline" resizes on the event loop, "thread" uses
+asyncio.to_thread, "process" uses the bot's ProcessPool.
+"""
+
+import argparse
+import asyncio
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image
+from process_pool import ProcessPool
+from thumbnails import resize_thumbnail
+
+TICK = 0.005
+
+
+def percentile(values, pct):
+    """Return the pct-th percentile of values"""
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def make_photo(seed, size):
+    """A noisy photo so decoding and encoding do realistic work"""
+    image = Image.effect_noise(size, 64 + seed % 32).convert("RGB")
+    output = io.BytesIO()
+    image.save(output, "JPEG", quality=90)
+    return output.getvalue()
+
+
+async def measure(resize, photos):
+    """Resize all photos at once while sampling event-loop lag"""
+    lags = []
+    running = True
+    
+    async def ticker():
+        while running:
+            start = time.perf_counter()
+            await asyncio.sleep(TICK)
+            lags.append((time.perf_counter() - start - TICK) * 1000)
+    
+    tick_task = asyncio.create_task(ticker())
+    await asyncio.sleep(TICK * 2)
+    start = time.perf_counter()
+    await asyncio.gather(*(resize(photo) for photo in photos))
+    elapsed = time.perf_counter() - start
+    running = False
+    await tick_task
+    return lags, elapsed
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", type=int, default=50)
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    args = parser.parse_args()
+    
+    photos = [make_photo(seed, (args.width, args.height)) for seed in range(args.images)]
+    pool = ProcessPool()
+    
+    async def inline(photo):
+        resize_thumbnail(photo)
+    
+    async def thread(photo):
+        await asyncio.to_thread(resize_thumbnail, photo)
+    
+    async def process(photo):
+        await pool.run(resize_thumbnail, photo)
+    
+    # Start the worker processes outside the measurement
+    await pool.run(resize_thumbnail, photos[0])
+    
+    print(f"{args.images} thumbnails from {args.width}x{args.height} photos, {pool.workers} pool workers")
+    for label, resize in (("inline", inline), ("thread", thread), ("process", process)):
+        lags, elapsed = await measure(resize, photos)
+        print(
+            f"{label:<8} loop lag max={max(lags):8.1f} ms  p99={percentile(lags, 99):8.1f} ms  "
+            f"total={elapsed:6.2f} s"
+        )
+    pool.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,113 @@
+"""
+Per-name cost of the filename metadata parser.
+
+Parses a corpus of release names with an empty cache (every name goes
+through the regex bank), then re-parses the names still held in the
+memoization cache, and prints the mean and p99 cost per name in microseconds along
+with how many names each field was extracted from:
+
+    python benchmarks/filename_parsing.py --names 20000
+
+By default a corpus is generated from common scene/web/anime naming
+styles. Pass --corpus with a text file of one release name per line to
+benchmark a real list instead.
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from filename_parser import _parse_filename, parse_filename
+
+TITLES = [
+    "Breaking Bad", "The Office US", "House of the Dragon", "One Piece", "Dark",
+    "The Last of Us", "Stranger Things", "Attack on Titan", "Better Call Saul",
+    "Money Heist", "The Boys", "Succession", "Shogun", "Arcane", "Severance"
+]
+QUALITIES = ["480p", "720p", "1080p", "2160p", "4K", ""]
+CODECS = ["x264", "x265", "HEVC", "H.264", "H 265", ""]
+AUDIO = ["AAC", "AAC2.0", "DDP5.1", "DDP5.1 Atmos", "TrueHD 7.1 Atmos", "DTS-HD", ""]
+SOURCES = ["WEB-DL", "BluRay", "WEBRip", "HDTV", "AMZN WEB-DL", "NF WEB-DL"]
+GROUPS = ["NTb", "FLUX", "DEMAND", "SubsPlease", "Erai-raws", "RARBG"]
+EXTENSIONS = [".mkv", ".mp4", ".avi"]
+
+
+def release_name(rng):
+    """Build one release name in a random naming style"""
+    title = rng.choice(TITLES)
+    season, episode = rng.randint(1, 12), rng.randint(1, 1100)
+    tags = [rng.choice(QUALITIES), rng.choice(SOURCES), rng.choice(AUDIO), rng.choice(CODECS)]
+    tags = " ".join(tag for tag in tags if tag)
+    style = rng.randrange(5)
+    
+    if style == 0:
+        name = f"{title} S{season:02d}E{episode:02d} {tags}-{rng.choice(GROUPS)}".replace(" ", ".")
+    elif style == 1:
+        name = f"{title} {season}x{episode:02d} {tags}"
+    elif style == 2:
+        name = f"[{rng.choice(GROUPS)}] {title} - Episode {episode} [{tags}]"
+    elif style == 3:
+        name = f"{title} Season {season} Ep {episode} {tags}".replace(" ", "_")
+    else:
+        name = f"{title} ({rng.randint(1980, 2025)}) {tags}"
+    return name + rng.choice(EXTENSIONS)
+
+
+def percentile(values, pct):
+    """Return the pct-th percentile of values"""
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def timed_pass(names):
+    """Parse every name and return the per-name cost in microseconds"""
+    costs = []
+    for name in names:
+        start = time.perf_counter()
+        parse_filename(name)
+        costs.append((time.perf_counter() - start) * 1_000_000)
+    return costs
+
+
+def report(label, costs):
+    print(
+        f"{label:<8} mean={statistics.mean(costs):7.2f} us  "
+        f"p99={percentile(costs, 99):7.2f} us  "
+        f"total={sum(costs) / 1000:8.1f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--names", type=int, default=20000)
+    parser.add_argument("--corpus", help="file with one release name per line")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    
+    if args.corpus:
+        with open(args.corpus, encoding="utf-8") as corpus:
+            names = [line.strip() for line in corpus if line.strip()]
+    else:
+        rng = random.Random(args.seed)
+        names = [release_name(rng) for _ in range(args.names)]
+    
+    _parse_filename.cache_clear()
+    print(f"{len(names)} names ({len(set(names))} unique), cache size {_parse_filename.cache_info().maxsize}")
+    report("cold", timed_pass(names))
+    # Only the most recent names are still memoized after the cold pass
+    report("cached", timed_pass(names[-_parse_filename.cache_info().maxsize:]))
+    
+    results = [parse_filename(name) for name in names]
+    for field in ("season", "episode", "quality", "codec", "audio"):
+        found = sum(1 for result in results if result[field])
+        print(f"  {field:<8} found in {found / len(names):6.1%} of names")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Light-user latency under a heavy-user flood: FIFO vs the fair-share
+JobQueue.
+
+Simulates a few heavy users who each dump a batch of multi-GB files at
+once, while light users (one of them an admin) trickle in small files.
+Processing time is proportional to file size. For every scheduler the
+time from submit to completion of the light users' files is reported:
+
+    python benchmarks/job_scheduling.py --heavy-users 3 --heavy-files 60
+
+"fifo" is one global queue in arrival order, like processing files as
+they come in; "fair" is jobs.JobQueue with deficit round robin,
+shortest-job-first within a user and the admin priority boost.
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from jobs import JobQueue
+
+GB = 1024 ** 3
+MB = 1024 ** 2
+ADMIN_ID = -1
+
+
+def percentile(values, pct):
+    """Return the pct-th percentile of values"""
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class FifoQueue:
+    """Global arrival-order queue with the same number of workers"""
+    
+    def __init__(self, workers, **kwargs):
+        self.queue = asyncio.Queue()
+        self.workers = workers
+        self._tasks = []
+    
+    async def submit(self, user_id, func, *args, size=None):
+        await self.queue.put((func, args))
+    
+    async def _worker(self):
+        while True:
+            func, args = await self.queue.get()
+            await func(*args)
+    
+    def start(self):
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+    
+    def stop(self):
+        for task in self._tasks:
+            task.cancel()
+
+
+def workload(args, rng):
+    """(arrival time, user_id, size) of every file"""
+    files = []
+    for user_id in range(args.heavy_users):
+        for _ in range(args.heavy_files):
+            files.append((0.0, user_id, rng.randint(1 * GB, 4 * GB)))
+    light_users = [ADMIN_ID] + list(range(1000, 1000 + args.light_users))
+    for user_id in light_users:
+        for _ in range(args.light_files):
+            files.append((rng.uniform(0, args.duration), user_id, rng.randint(20 * MB, 300 * MB)))
+    return sorted(files)
+
+
+async def run(queue, files, seconds_per_gb):
+    """Submit files at their arrival times and collect latencies per user"""
+    latencies = {}
+    done = asyncio.Event()
+    remaining = len(files)
+    
+    async def process(user_id, size, submitted):
+        nonlocal remaining
+        await asyncio.sleep(size / GB * seconds_per_gb)
+        latencies.setdefault(user_id, []).append(time.perf_counter() - submitted)
+        remaining -= 1
+        if not remaining:
+            done.set()
+    
+    queue.start()
+    start = time.perf_counter()
+    for arrival, user_id, size in files:
+        delay = arrival - (time.perf_counter() - start)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        await queue.submit(user_id, process, user_id, size, time.perf_counter(), size=size)
+    await done.wait()
+    queue.stop()
+    return latencies
+
+
+def report(label, latencies, args):
+    light = [value for user_id, values in latencies.items() if user_id >= 1000 for value in values]
+    heavy = [value for user_id, values in latencies.items() if 0 <= user_id < args.heavy_users for value in values]
+    admin = latencies.get(ADMIN_ID, [])
+    print(
+        f"{label:<5} light p50={percentile(light, 50):6.2f}s p99={percentile(light, 99):6.2f}s  "
+        f"admin max={max(admin):6.2f}s  "
+        f"heavy mean={statistics.mean(heavy):6.2f}s max={max(heavy):6.2f}s"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--user-concurrency", type=int, default=2)
+    parser.add_argument("--heavy-users", type=int, default=3)
+    parser.add_argument("--heavy-files", type=int, default=60)
+    parser.add_argument("--light-users", type=int, default=30)
+    parser.add_argument("--light-files", type=int, default=2)
+    parser.add_argument("--duration", type=float, default=3.0, help="seconds over which light files arrive")
+    parser.add_argument("--seconds-per-gb", type=float, default=0.02)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    
+    files = workload(args, random.Random(args.seed))
+    print(
+        f"{len(files)} files, {args.workers} workers, {args.heavy_users} heavy users x {args.heavy_files} files, "
+        f"{args.light_users + 1} light users x {args.light_files} files"
+    )
+    
+    fair = JobQueue(workers=args.workers, user_concurrency=args.user_concurrency)
+    fair.get_weight = lambda user_id: fair.priority_boost if user_id == ADMIN_ID else 1
+    schedulers = {
+        "fifo": FifoQueue(args.workers),
+        "fair": fair,
+    }
+    for label, queue in schedulers.items():
+        report(label, await run(queue, files, args.seconds_per_gb), args)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,94 @@
+"""
+Render throughput of rename formats: the original str.replace based
+parse_rename_format vs compiled templates.
+
+Renders a set of typical user formats with parsed file name values and
+prints renders per second for each implementation:
+
+    python benchmarks/rename_format.py --renders 200000
+"""
+
+import argparse
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rename_template import compile_format
+from utils import parse_rename_format, sanitize_filename
+
+FORMATS = [
+    "S{season}E{episode} - {title}",
+    "{title} ({quality})",
+    "{title} [{audio}]",
+    "{title} S{season}E{episode} [{quality}] [{codec}] [{audio}] @MyChannel",
+]
+VALUES = {
+    "title": "House of the Dragon",
+    "season": "02",
+    "episode": "01",
+    "quality": "2160p",
+    "codec": "H.265",
+    "audio": "DDP5.1 Atmos"
+}
+
+
+def original_sanitize_filename(filename):
+    filename = re.sub(r'[<>:"/\\|?*]', '_', filename)
+    filename = re.sub(r'\s+', ' ', filename)
+    name, ext = os.path.splitext(filename)
+    if len(name) > 100:
+        name = name[:100]
+    return name + ext
+
+
+def original_parse_rename_format(format_string, **kwargs):
+    """parse_rename_format as it was before compiled templates"""
+    result = format_string
+    replacements = {
+        '{season}': str(kwargs.get('season', '')),
+        '{episode}': str(kwargs.get('episode', '')),
+        '{title}': str(kwargs.get('title', '')),
+        '{quality}': str(kwargs.get('quality', '')),
+        '{audio}': str(kwargs.get('audio', '')),
+    }
+    for key, value in replacements.items():
+        result = result.replace(key, value)
+    return original_sanitize_filename(result)
+
+
+def throughput(render, renders):
+    """Renders per second of render(format_string)"""
+    start = time.perf_counter()
+    for i in range(renders):
+        render(FORMATS[i % len(FORMATS)])
+    return renders / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--renders", type=int, default=200000)
+    args = parser.parse_args()
+    
+    # Both implementations must produce the same names ({codec} is new)
+    for format_string in FORMATS[:3]:
+        assert original_parse_rename_format(format_string, **VALUES) == parse_rename_format(format_string, **VALUES)
+    
+    runs = {
+        "original": lambda format_string: original_parse_rename_format(format_string, **VALUES),
+        "parse_rename_format": lambda format_string: parse_rename_format(format_string, **VALUES),
+        "compiled render": lambda format_string: sanitize_filename(compile_format(format_string).render(VALUES)),
+    }
+    
+    print(f"{args.renders} renders over {len(FORMATS)} formats")
+    baseline = None
+    for label, render in runs.items():
+        rate = throughput(render, args.renders)
+        baseline = baseline or rate
+        print(f"{label:<20} {rate:12,.0f} renders/s  ({rate / baseline:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Per-operation latency of the storage backends.
+
+Runs the same settings reads and writes against each backend directly
+(bypassing the Database cache) and prints the mean and p99 time per
+operation in microseconds:
+
+    python benchmarks/storage_latency.py --ops 2000
+
+The in-memory and SQLite backends always run. The MongoDB backend runs
+too when DB_URL is set in the environment or .env; it writes to a
+separate file_rename_bot_bench database.
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+from storage import create_backend
+from storage.sqlite import SQLiteBackend
+
+USERS = 1000
+
+
+def percentile(values, pct):
+    """Return the pct-th percentile of values"""
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def seed(backend):
+    """Give every benchmark user a full set of settings"""
+    for user_id in range(USERS):
+        await backend.add_user(user_id, f"user{user_id}", "Bench")
+        await backend.set_rename_format(user_id, "S{season}E{episode} - {title}")
+        await backend.set_prefix(user_id, "[HD] ")
+        await backend.set_caption(user_id, "Renamed by bench")
+    await backend.add_rename_counts([(user_id, user_id % 97) for user_id in range(USERS)])
+
+
+def operations(backend):
+    """Operations to time, each taking a user_id"""
+    return {
+        "get_user_profile": backend.get_user_profile,
+        "get_rename_format": backend.get_rename_format,
+        "set_prefix": lambda user_id: backend.set_prefix(user_id, "[HD] "),
+        "add_rename_counts": lambda user_id: backend.add_rename_counts([(user_id, 1)]),
+        "get_user_rank": backend.get_user_rank,
+        "get_leaderboard": lambda user_id: backend.get_leaderboard(10),
+    }
+
+
+async def bench(backend, ops):
+    if not await backend.connect():
+        print(f"{backend.name}: could not connect, skipped")
+        return
+    await seed(backend)
+    
+    for op_name, op in operations(backend).items():
+        timings = []
+        for i in range(ops):
+            started = time.perf_counter()
+            await op(i % USERS)
+            timings.append((time.perf_counter() - started) * 1_000_000)
+        print(
+            f"{backend.name:<8} {op_name:<20} "
+            f"mean={statistics.mean(timings):10.1f} us  p99={percentile(timings, 99):10.1f} us"
+        )
+    
+    await backend.disconnect()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ops", type=int, default=2000)
+    args = parser.parse_args()
+    load_dotenv()
+    
+    backends = [create_backend("memory")]
+    with tempfile.TemporaryDirectory() as tmp:
+        backends.append(SQLiteBackend(os.path.join(tmp, "bench.db")))
+        if os.getenv("DB_URL"):
+            from storage.mongo import MongoBackend
+            backends.append(MongoBackend(os.getenv("DB_URL"), "file_rename_bot_bench"))
+        
+        for backend in backends:
+            await bench(backend, args.ops)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -25,6 +25,43 @@ MAX_FILE_SIZE = 2000 * 1024 * 1024  # 2GB
 ALLOWED_EXTENSIONS = ['.mkv', '.mp4', '.avi', '.mov', '.webm', '.flv', '.m4v']
 THUMBNAIL_WIDTH = 320
 THUMBNAIL_HEIGHT = 180
+THUMBNAIL_QUALITY = int(os.getenv("THUMBNAIL_QUALITY", 85))  # JPEG quality
+THUMBNAIL_CACHE_DIR = os.getenv("THUMBNAIL_CACHE_DIR", "thumbnails")
+THUMBNAIL_CACHE_SIZE = int(os.getenv("THUMBNAIL_CACHE_SIZE_MB", 50)) * 1024 * 1024
+AUTO_THUMBNAIL = os.getenv("AUTO_THUMBNAIL", "false").lower() == "true"  # video frame when no thumbnail is set
+AUTO_THUMBNAIL_OFFSET = float(os.getenv("AUTO_THUMBNAIL_OFFSET", 10))  # seconds into the video
+AUTO_THUMBNAIL_HEAD_SIZE = int(os.getenv("AUTO_THUMBNAIL_HEAD_MB", 8)) * 1024 * 1024  # bytes fetched to find it
+PROCESS_POOL_MAX_WORKERS = int(os.getenv("PROCESS_POOL_MAX_WORKERS", 4))  # further capped by the CPU quota
+PROCESS_POOL_QUEUE_SIZE = int(os.getenv("PROCESS_POOL_QUEUE_SIZE", 16))  # jobs waiting for a worker
+DOWNLOAD_DIR = os.getenv("DOWNLOAD_DIR", "downloads")
+SCRATCH_QUOTA = int(os.getenv("SCRATCH_QUOTA_MB", 4096)) * 1024 * 1024  # bytes of DOWNLOAD_DIR jobs may use
+SCRATCH_TMPFS_DIR = os.getenv("SCRATCH_TMPFS_DIR", "")  # e.g. /dev/shm, tried before DOWNLOAD_DIR
+SCRATCH_TMPFS_QUOTA = int(os.getenv("SCRATCH_TMPFS_QUOTA_MB", 0)) * 1024 * 1024
+FFMPEG_PATH = os.getenv("FFMPEG_PATH", "ffmpeg")
+FFPROBE_PATH = os.getenv("FFPROBE_PATH", "ffprobe")
+FFMPEG_MAX_PROCESSES = int(os.getenv("FFMPEG_MAX_PROCESSES", 2))
+MEDIA_PROBE = os.getenv("MEDIA_PROBE", "true").lower() == "true"  # read quality, audio and duration from file headers
+PROBE_HEAD_SIZE = int(os.getenv("PROBE_HEAD_MB", 2)) * 1024 * 1024  # bytes fetched from the start of a file
+PROBE_TAIL_SIZE = int(os.getenv("PROBE_TAIL_MB", 2)) * 1024 * 1024  # and from the end when its index is there
+PROBE_CACHE_SIZE = int(os.getenv("PROBE_CACHE_SIZE", 10000))
+LEADERBOARD_SIZE = int(os.getenv("LEADERBOARD_SIZE", 10))
+LEADERBOARD_REFRESH_INTERVAL = int(os.getenv("LEADERBOARD_REFRESH_INTERVAL", 60))  # seconds
+FILENAME_CACHE_SIZE = int(os.getenv("FILENAME_CACHE_SIZE", 4096))
+TEMPLATE_CACHE_SIZE = int(os.getenv("TEMPLATE_CACHE_SIZE", 1024))
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", 4))  # max files processed at once
+JOB_USER_CONCURRENCY = int(os.getenv("JOB_USER_CONCURRENCY", 1))  # max files per user at once
+JOB_QUANTUM = int(os.getenv("JOB_QUANTUM", 256 * 1024 * 1024))  # bytes credited per scheduling turn
+JOB_PRIORITY_BOOST = int(os.getenv("JOB_PRIORITY_BOOST", 4))  # turn weight of admins and the owner
+RATE_LIMIT_GLOBAL_RATE = float(os.getenv("RATE_LIMIT_GLOBAL_RATE", 25))  # messages per second overall
+RATE_LIMIT_CHAT_RATE = float(os.getenv("RATE_LIMIT_CHAT_RATE", 1))  # messages per second per chat
+RATE_LIMIT_CHAT_BURST = int(os.getenv("RATE_LIMIT_CHAT_BURST", 3))
+RATE_LIMIT_LOG_RATE = float(os.getenv("RATE_LIMIT_LOG_RATE", 0.3))  # messages per second to LOG_CHANNEL
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", 100))  # log messages waiting to be sent before the oldest are dropped
+RATE_LIMIT_MAX_RETRIES = int(os.getenv("RATE_LIMIT_MAX_RETRIES", 3))  # FloodWait retries per call
+RATE_LIMIT_MAX_CHATS = int(os.getenv("RATE_LIMIT_MAX_CHATS", 10000))  # per-chat buckets kept
+ALBUM_WINDOW = float(os.getenv("ALBUM_WINDOW", 1.5))  # seconds to wait for the rest of an album
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", 10000))
+RESULT_CACHE_TTL = int(os.getenv("RESULT_CACHE_TTL", 86400))  # seconds
 
 # Messages
 START_MESSAGE = """
@@ -1,334 +1,446 @@
+import asyncio
+import functools
 import logging
 import os
-from pymongo import MongoClient
-from pymongo.errors import ConnectionFailure
+import time
+from collections import OrderedDict, defaultdict
 from dotenv import load_dotenv
-from datetime import datetime
+from datetime import datetime, timedelta
+from storage import create_backend
 
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+_MISSING = object()
+
+class TTLCache:
+    """Bounded LRU cache whose entries expire after a fixed TTL"""
+    
+    def __init__(self, max_size=10000, ttl=300):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def get(self, key, default=None):
+        """Get a value, counting the lookup as a hit or a miss"""
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+        
+        value, expires_at = entry
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return default
+        
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+    
+    def set(self, key, value):
+        """Store a value, evicting the least recently used entries if full"""
+        if self.max_size <= 0:
+            return
+        self._data[key] = (value, time.monotonic() + self.ttl)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+            self.evictions += 1
+    
+    def delete(self, key):
+        """Drop a value if present"""
+        self._data.pop(key, None)
+    
+    def clear(self):
+        """Drop all values"""
+        self._data.clear()
+    
+    def __len__(self):
+        return len(self._data)
+    
+    def stats(self):
+        """Get size and hit/miss/eviction counters"""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+def cached_setting(name):
+    """Serve a per-user getter from Database.cache, keyed by (name, user_id)"""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(self, user_id):
+            key = (name, user_id)
+            value = self.cache.get(key, _MISSING)
+            if value is _MISSING:
+                generation = self._generations.get(key, 0)
+                value = await func(self, user_id)
+                # A write during the read may have made value stale; don't cache it
+                if self._generations.get(key, 0) == generation:
+                    self.cache.set(key, value)
+            return value
+        return wrapper
+    return decorator
+
 class Database:
-    def __init__(self):
-        self.db_url = os.getenv("DB_URL")
-        self.db_name = os.getenv("DATABASE_NAME", "file_rename_bot")
-        self.client = None
-        self.db = None
+    def __init__(self, backend=None):
+        self.backend = backend or create_backend()
+        self.cache = TTLCache(
+            max_size=int(os.getenv("SETTINGS_CACHE_SIZE", 10000)),
+            ttl=float(os.getenv("SETTINGS_CACHE_TTL", 300))
+        )
+        # Bumped by every invalidation so reads in flight can tell they raced a write
+        self._generations = defaultdict(int)
+        self.banned_users = set()
+        self.ban_sync_interval = float(os.getenv("BAN_SYNC_INTERVAL", 60))
+        self._ban_synced_at = None
+        self.admin_ids = set()
+        self.admin_sync_interval = float(os.getenv("ADMIN_SYNC_INTERVAL", 300))
+        self.rename_flush_interval = float(os.getenv("RENAME_FLUSH_INTERVAL", 5))
+        self.rename_flush_ops = int(os.getenv("RENAME_FLUSH_OPS", 100))
+        self._pending_renames = defaultdict(int)
+        self._pending_rename_ops = 0
+        self._flush_lock = asyncio.Lock()
+        self._connected = False
+        self._tasks = []
         
-    def connect(self):
-        """Connect to MongoDB"""
-        try:
-            self.client = MongoClient(self.db_url)
-            self.db = self.client[self.db_name]
-            self.client.admin.command('ping')
-            logger.info("Connected to MongoDB successfully")
-            return True
-        except ConnectionFailure as e:
-            logger.error(f"Failed to connect to MongoDB: {e}")
+    async def connect(self):
+        """Connect to the storage backend and load in-memory state"""
+        if not await self.backend.connect():
             return False
+        
+        self._connected = True
+        await self.load_banned_users()
+        if self.ban_sync_interval > 0:
+            self._run_periodically(self.ban_sync_interval, self.sync_banned_users)
+        await self.load_admins()
+        if self.admin_sync_interval > 0:
+            self._run_periodically(self.admin_sync_interval, self.load_admins)
+        # With no interval, counts are flushed every RENAME_FLUSH_OPS renames and on disconnect
+        if self.rename_flush_interval > 0:
+            self._run_periodically(self.rename_flush_interval, self.flush_rename_counts)
+        return True
+    
+    def _run_periodically(self, interval, func):
+        """Await func every interval seconds until disconnect"""
+        async def loop():
+            while True:
+                await asyncio.sleep(interval)
+                try:
+                    await func()
+                except Exception as e:
+                    logger.error(f"Error in periodic {func.__name__}: {e}")
+        
+        self._tasks.append(asyncio.create_task(loop()))
     
-    def disconnect(self):
-        """Disconnect from MongoDB"""
-        if self.client:
-            self.client.close()
-            logger.info("Disconnected from MongoDB")
+    async def disconnect(self):
+        """Flush buffered writes and disconnect from the storage backend"""
+        for task in self._tasks:
+            task.cancel()
+        self._tasks.clear()
+        
+        if self._connected:
+            try:
+                await self.flush_rename_counts()
+            except Exception as e:
+                logger.error(f"Failed to flush rename counts on shutdown: {e}")
+            await self.backend.disconnect()
+            self._connected = False
+    
+    # Settings cache operations
+    def _invalidate(self, user_id, *names):
+        """Drop cached settings of a user, including the combined profile"""
+        for name in names + ("profile",):
+            self.cache.delete((name, user_id))
+            self._generations[(name, user_id)] += 1
+    
+    def get_cache_stats(self):
+        """Get settings cache size and hit/miss/eviction counters"""
+        return self.cache.stats()
     
     # User operations
-    def add_user(self, user_id, username=None, first_name=None):
+    async def add_user(self, user_id, username=None, first_name=None):
         """Add or update user in database"""
-        users = self.db["users"]
-        users.update_one(
-            {"user_id": user_id},
-            {
-                "$set": {
-                    "username": username,
-                    "first_name": first_name,
-                    "joined_date": datetime.now()
-                },
-                "$setOnInsert": {
-                    "rename_count": 0,
-                    "is_banned": False
-                }
-            },
-            upsert=True
-        )
+        await self.backend.add_user(user_id, username, first_name)
     
-    def get_user(self, user_id):
+    async def get_user(self, user_id):
         """Get user data"""
-        users = self.db["users"]
-        return users.find_one({"user_id": user_id})
+        return await self.backend.get_user(user_id)
     
-    def user_exists(self, user_id):
+    async def user_exists(self, user_id):
         """Check if user exists"""
-        return self.get_user(user_id) is not None
-    
-    def increment_rename_count(self, user_id):
-        """Increment user's rename count"""
-        users = self.db["users"]
-        users.update_one(
-            {"user_id": user_id},
-            {"$inc": {"rename_count": 1}}
-        )
+        return await self.get_user(user_id) is not None
+    
+    async def increment_rename_count(self, user_id):
+        """Increment user's rename count (buffered, see flush_rename_counts)"""
+        self._pending_renames[user_id] += 1
+        self._pending_rename_ops += 1
+        if self._pending_rename_ops >= self.rename_flush_ops:
+            try:
+                await self.flush_rename_counts()
+            except Exception as e:
+                # Failed increments stay buffered for the next flush
+                logger.error(f"Failed to flush rename counts: {e}")
+    
+    async def flush_rename_counts(self):
+        """Write all buffered rename count increments in one batch"""
+        async with self._flush_lock:
+            if not self._pending_renames:
+                return
+            
+            pending = list(self._pending_renames.items())
+            self._pending_renames = defaultdict(int)
+            self._pending_rename_ops = 0
+            
+            try:
+                failed = await self.backend.add_rename_counts(pending)
+            except Exception:
+                self._requeue_rename_counts(pending)
+                raise
+            if failed:
+                self._requeue_rename_counts(failed)
+                raise RuntimeError(f"{len(failed)} rename count updates failed")
+    
+    def _requeue_rename_counts(self, pending):
+        """Put increments that failed to write back into the buffer"""
+        for user_id, count in pending:
+            self._pending_renames[user_id] += count
+            self._pending_rename_ops += count
+    
+    def get_pending_rename_ops(self):
+        """Get the number of rename count increments not yet written"""
+        return self._pending_rename_ops
+    
+    # Profile operations
+    @cached_setting("profile")
+    async def get_user_profile(self, user_id):
+        """Get ban flag and all rename settings of a user in one round-trip"""
+        return await self.backend.get_user_profile(user_id)
     
     # Thumbnail operations
-    def set_thumbnail(self, user_id, file_id, file_unique_id):
+    async def set_thumbnail(self, user_id, file_id, file_unique_id):
         """Set user's thumbnail"""
-        thumbnails = self.db["thumbnails"]
-        thumbnails.update_one(
-            {"user_id": user_id},
-            {
-                "$set": {
-                    "file_id": file_id,
-                    "file_unique_id": file_unique_id,
-                    "updated_at": datetime.now()
-                }
-            },
-            upsert=True
-        )
+        await self.backend.set_thumbnail(user_id, file_id, file_unique_id)
+        self._invalidate(user_id, "thumbnail")
     
-    def get_thumbnail(self, user_id):
+    @cached_setting("thumbnail")
+    async def get_thumbnail(self, user_id):
         """Get user's thumbnail"""
-        thumbnails = self.db["thumbnails"]
-        return thumbnails.find_one({"user_id": user_id})
+        return await self.backend.get_thumbnail(user_id)
     
-    def delete_thumbnail(self, user_id):
+    async def delete_thumbnail(self, user_id):
         """Delete user's thumbnail"""
-        thumbnails = self.db["thumbnails"]
-        thumbnails.delete_one({"user_id": user_id})
+        await self.backend.delete_thumbnail(user_id)
+        self._invalidate(user_id, "thumbnail")
     
     # Caption operations
-    def set_caption(self, user_id, caption):
+    async def set_caption(self, user_id, caption):
         """Set user's custom caption"""
-        captions = self.db["captions"]
-        captions.update_one(
-            {"user_id": user_id},
-            {
-                "$set": {
-                    "caption": caption,
-                    "updated_at": datetime.now()
-                }
-            },
-            upsert=True
-        )
+        await self.backend.set_caption(user_id, caption)
+        self._invalidate(user_id, "caption")
     
-    def get_caption(self, user_id):
+    @cached_setting("caption")
+    async def get_caption(self, user_id):
         """Get user's custom caption"""
-        captions = self.db["captions"]
-        result = captions.find_one({"user_id": user_id})
-        return result["caption"] if result else None
+        return await self.backend.get_caption(user_id)
     
-    def delete_caption(self, user_id):
+    async def delete_caption(self, user_id):
         """Delete user's custom caption"""
-        captions = self.db["captions"]
-        captions.delete_one({"user_id": user_id})
+        await self.backend.delete_caption(user_id)
+        self._invalidate(user_id, "caption")
     
     # Rename format operations
-    def set_rename_format(self, user_id, format_string):
+    async def set_rename_format(self, user_id, format_string):
         """Set user's rename format"""
-        formats = self.db["rename_formats"]
-        formats.update_one(
-            {"user_id": user_id},
-            {
-                "$set": {
-                    "format": format_string,
-                    "updated_at": datetime.now()
-                }
-            },
-            upsert=True
-        )
+        await self.backend.set_rename_format(user_id, format_string)
+        self._invalidate(user_id, "rename_format")
     
-    def get_rename_format(self, user_id):
+    @cached_setting("rename_format")
+    async def get_rename_format(self, user_id):
         """Get user's rename format"""
-        formats = self.db["rename_formats"]
-        result = formats.find_one({"user_id": user_id})
-        return result["format"] if result else None
+        return await self.backend.get_rename_format(user_id)
     
     # Prefix/Suffix operations
-    def set_prefix(self, user_id, prefix):
+    async def set_prefix(self, user_id, prefix):
         """Set user's prefix"""
-        affixes = self.db["affixes"]
-        affixes.update_one(
-            {"user_id": user_id},
-            {"$set": {"prefix": prefix}},
-            upsert=True
-        )
+        await self.backend.set_prefix(user_id, prefix)
+        self._invalidate(user_id, "prefix")
     
-    def get_prefix(self, user_id):
+    @cached_setting("prefix")
+    async def get_prefix(self, user_id):
         """Get user's prefix"""
-        affixes = self.db["affixes"]
-        result = affixes.find_one({"user_id": user_id})
-        return result.get("prefix") if result else None
+        return await self.backend.get_prefix(user_id)
     
-    def set_suffix(self, user_id, suffix):
+    async def set_suffix(self, user_id, suffix):
         """Set user's suffix"""
-        affixes = self.db["affixes"]
-        affixes.update_one(
-            {"user_id": user_id},
-            {"$set": {"suffix": suffix}},
-            upsert=True
-        )
+        await self.backend.set_suffix(user_id, suffix)
+        self._invalidate(user_id, "suffix")
     
-    def get_suffix(self, user_id):
+    @cached_setting("suffix")
+    async def get_suffix(self, user_id):
         """Get user's suffix"""
-        affixes = self.db["affixes"]
-        result = affixes.find_one({"user_id": user_id})
-        return result.get("suffix") if result else None
+        return await self.backend.get_suffix(user_id)
     
-    def delete_prefix(self, user_id):
+    async def delete_prefix(self, user_id):
         """Delete user's prefix"""
-        affixes = self.db["affixes"]
-        affixes.update_one(
-            {"user_id": user_id},
-            {"$unset": {"prefix": ""}}
-        )
+        await self.backend.delete_prefix(user_id)
+        self._invalidate(user_id, "prefix")
     
-    def delete_suffix(self, user_id):
+    async def delete_suffix(self, user_id):
         """Delete user's suffix"""
-        affixes = self.db["affixes"]
-        affixes.update_one(
-            {"user_id": user_id},
-            {"$unset": {"suffix": ""}}
-        )
+        await self.backend.delete_suffix(user_id)
+        self._invalidate(user_id, "suffix")
     
     # Metadata operations
-    def set_metadata(self, user_id, title=None, author=None):
+    async def set_metadata(self, user_id, title=None, author=None):
         """Set user's metadata"""
-        metadata = self.db["metadata"]
-        update_data = {"updated_at": datetime.now()}
-        if title:
-            update_data["title"] = title
-        if author:
-            update_data["author"] = author
-        
-        metadata.update_one(
-            {"user_id": user_id},
-            {"$set": update_data},
-            upsert=True
-        )
+        await self.backend.set_metadata(user_id, title=title, author=author)
+        self._invalidate(user_id, "metadata")
     
-    def get_metadata(self, user_id):
+    @cached_setting("metadata")
+    async def get_metadata(self, user_id):
         """Get user's metadata"""
-        metadata = self.db["metadata"]
-        return metadata.find_one({"user_id": user_id})
+        return await self.backend.get_metadata(user_id)
+    
+    async def delete_metadata(self, user_id):
+        """Delete user's metadata"""
+        await self.backend.delete_metadata(user_id)
+        self._invalidate(user_id, "metadata")
+    
+    # Media format operations
+    async def set_media_format(self, user_id, media_format):
+        """Set user's output container, e.g. mp4 or mkv"""
+        await self.backend.set_media_format(user_id, media_format)
+        self._invalidate(user_id, "media_format")
+    
+    @cached_setting("media_format")
+    async def get_media_format(self, user_id):
+        """Get user's output container"""
+        return await self.backend.get_media_format(user_id)
     
     # Force subscribe channels
-    def add_force_sub_channel(self, channel_username):
+    async def add_force_sub_channel(self, channel_username):
         """Add channel to force subscribe list"""
-        channels = self.db["force_sub_channels"]
-        channels.update_one(
-            {"username": channel_username},
-            {"$set": {"username": channel_username}},
-            upsert=True
-        )
+        await self.backend.add_force_sub_channel(channel_username)
     
-    def remove_force_sub_channel(self, channel_username):
+    async def remove_force_sub_channel(self, channel_username):
         """Remove channel from force subscribe list"""
-        channels = self.db["force_sub_channels"]
-        channels.delete_one({"username": channel_username})
+        await self.backend.remove_force_sub_channel(channel_username)
     
-    def get_all_force_sub_channels(self):
+    async def get_all_force_sub_channels(self):
         """Get all force subscribe channels"""
-        channels = self.db["force_sub_channels"]
-        return list(channels.find({}, {"_id": 0}))
+        return await self.backend.get_all_force_sub_channels()
     
     # Ban operations
-    def ban_user(self, user_id):
+    async def ban_user(self, user_id):
         """Ban a user"""
-        users = self.db["users"]
-        users.update_one(
-            {"user_id": user_id},
-            {"$set": {"is_banned": True}}
-        )
+        await self.backend.set_banned(user_id, True, datetime.now())
+        self.banned_users.add(user_id)
+        self._invalidate(user_id)
     
-    def unban_user(self, user_id):
+    async def unban_user(self, user_id):
         """Unban a user"""
-        users = self.db["users"]
-        users.update_one(
-            {"user_id": user_id},
-            {"$set": {"is_banned": False}}
-        )
+        await self.backend.set_banned(user_id, False, datetime.now())
+        self.banned_users.discard(user_id)
+        self._invalidate(user_id)
     
     def is_user_banned(self, user_id):
-        """Check if user is banned"""
-        user = self.get_user(user_id)
-        return user.get("is_banned", False) if user else False
-    
-    def get_banned_users(self):
+        """Check if user is banned (in-memory, no database access)"""
+        return user_id in self.banned_users
+    
+    async def load_banned_users(self):
+        """Load the full set of banned user IDs"""
+        synced_at = datetime.now()
+        self.banned_users = set(await self.backend.get_banned_user_ids())
+        self._ban_synced_at = synced_at
+        logger.info(f"Loaded {len(self.banned_users)} banned users")
+    
+    async def sync_banned_users(self):
+        """Apply ban changes made since the last sync, e.g. by other instances"""
+        synced_at = datetime.now()
+        # Overlap the window a little to tolerate clock skew between instances
+        since = self._ban_synced_at - timedelta(seconds=self.ban_sync_interval)
+        for change in await self.backend.get_ban_changes(since):
+            if change.get("is_banned"):
+                self.banned_users.add(change["user_id"])
+            else:
+                self.banned_users.discard(change["user_id"])
+        self._ban_synced_at = synced_at
+    
+    async def get_banned_users(self):
         """Get all banned users"""
-        users = self.db["users"]
-        return list(users.find({"is_banned": True}))
+        return await self.backend.get_banned_users()
     
     # Admin operations
-    def add_admin(self, user_id):
+    async def add_admin(self, user_id):
         """Add an admin"""
-        admins = self.db["admins"]
-        admins.update_one(
-            {"user_id": user_id},
-            {"$set": {"user_id": user_id, "added_at": datetime.now()}},
-            upsert=True
-        )
+        await self.backend.add_admin(user_id, datetime.now())
+        self.admin_ids.add(user_id)
     
-    def remove_admin(self, user_id):
+    async def remove_admin(self, user_id):
         """Remove an admin"""
-        admins = self.db["admins"]
-        admins.delete_one({"user_id": user_id})
+        await self.backend.remove_admin(user_id)
+        self.admin_ids.discard(user_id)
     
-    def get_all_admins(self):
+    async def get_all_admins(self):
         """Get all admins"""
-        admins = self.db["admins"]
-        return list(admins.find({}, {"_id": 0}))
+        return await self.backend.get_all_admins()
+    
+    async def load_admins(self):
+        """Reload the in-memory admin roster"""
+        admins = await self.get_all_admins()
+        self.admin_ids = {admin["user_id"] for admin in admins}
     
     def is_admin(self, user_id):
-        """Check if user is admin"""
-        admins = self.db["admins"]
-        return admins.find_one({"user_id": user_id}) is not None
+        """Check if user is admin (in-memory, no database access)"""
+        return user_id in self.admin_ids
     
     # Leaderboard operations
-    def get_leaderboard(self, limit=10):
+    async def get_leaderboard(self, limit=10):
         """Get top users by rename count"""
-        users = self.db["users"]
-        return list(users.find({}, {"_id": 0}).sort("rename_count", -1).limit(limit))
+        return await self.backend.get_leaderboard(limit)
+    
+    async def get_user_rank(self, user_id):
+        """Get user's leaderboard position and rename count"""
+        return await self.backend.get_user_rank(user_id)
     
     # Sequence mode operations
-    def start_sequence(self, user_id):
+    async def start_sequence(self, user_id):
         """Start file sequence mode for user"""
-        sequences = self.db["sequences"]
-        sequences.update_one(
-            {"user_id": user_id},
-            {
-                "$set": {
-                    "is_active": True,
-                    "files": [],
-                    "started_at": datetime.now()
-                }
-            },
-            upsert=True
-        )
+        await self.backend.start_sequence(user_id)
+        self._invalidate(user_id)
     
-    def add_to_sequence(self, user_id, file_data):
-        """Add file to sequence"""
-        sequences = self.db["sequences"]
-        sequences.update_one(
-            {"user_id": user_id},
-            {"$push": {"files": file_data}}
-        )
+    async def add_to_sequence(self, user_id, file_data):
+        """Add file to sequence, return its position or None if not active"""
+        return await self.backend.add_to_sequence(user_id, file_data)
     
-    def end_sequence(self, user_id):
-        """End file sequence mode for user"""
-        sequences = self.db["sequences"]
-        sequences.update_one(
-            {"user_id": user_id},
-            {"$set": {"is_active": False}}
-        )
-        result = sequences.find_one({"user_id": user_id})
-        return result.get("files", []) if result else []
+    async def end_sequence(self, user_id):
+        """End the active sequence and return its id and number of files"""
+        sequence_id, count = await self.backend.end_sequence(user_id)
+        self._invalidate(user_id)
+        return sequence_id, count
+    
+    def iter_sequence(self, user_id, sequence_id):
+        """Stream an ended sequence's files in the order they were added"""
+        return self.backend.iter_sequence(user_id, sequence_id)
+    
+    async def clear_sequence(self, user_id, sequence_id):
+        """Delete an ended sequence's files"""
+        await self.backend.clear_sequence(user_id, sequence_id)
     
-    def is_sequence_active(self, user_id):
+    async def is_sequence_active(self, user_id):
         """Check if user has active sequence mode"""
-        sequences = self.db["sequences"]
-        result = sequences.find_one({"user_id": user_id})
-        return result.get("is_active", False) if result else False
+        return await self.backend.is_sequence_active(user_id)
 
 # Initialize database instance
 db = Database()
@@ -0,0 +1,112 @@
+import os
+import re
+from functools import lru_cache
+from config import FILENAME_CACHE_SIZE
+
+# Regex bank, compiled once at import. Separators in release names are
+# dots, spaces, underscores or dashes, so tags are delimited with
+# lookarounds rather than \b (which treats "_" as part of a word).
+_B = r"(?<![A-Za-z0-9])"
+_E = r"(?![A-Za-z0-9])"
+SEASON_EPISODE_RE = re.compile(_B + r"S(\d{1,2})[ ._-]?E(\d{1,4})" + _E, re.IGNORECASE)
+CROSS_EPISODE_RE = re.compile(_B + r"(\d{1,2})x(\d{2,4})" + _E)
+EPISODE_RE = re.compile(_B + r"(?:Episode|Ep)[ ._-]?(\d{1,4})" + _E, re.IGNORECASE)
+SEASON_RE = re.compile(_B + r"Season[ ._-]?(\d{1,2})" + _E, re.IGNORECASE)
+QUALITY_RE = re.compile(_B + r"(?:(480|576|720|1080|2160)[pi]|(4K|UHD))" + _E, re.IGNORECASE)
+CODEC_RE = re.compile(_B + r"(x264|x265|H[ .]?264|H[ .]?265|HEVC|AVC)" + _E, re.IGNORECASE)
+AUDIO_RE = re.compile(_B + r"(DDP|DD\+|E-?AC-?3|AC-?3|AAC|TrueHD|DTS(?:-HD)?|FLAC|Opus|Atmos)(?:[ .]?([1-7]\.[01]))?(?![A-Za-z])", re.IGNORECASE)
+YEAR_RE = re.compile(r"[(\[ ._]((?:19|20)\d{2})[)\] ._]")
+GROUP_TAG_RE = re.compile(r"^\s*\[[^\]]*\]\s*")
+SEPARATORS_RE = re.compile(r"[._]+|\s+")
+
+CODECS = {
+    "x264": "x264",
+    "h264": "H.264",
+    "x265": "x265",
+    "h265": "H.265",
+    "hevc": "HEVC",
+    "avc": "AVC"
+}
+
+AUDIO_CODECS = {
+    "ddp": "DDP",
+    "dd+": "DDP",
+    "eac3": "DDP",
+    "ac3": "AC3",
+    "aac": "AAC",
+    "truehd": "TrueHD",
+    "dts": "DTS",
+    "dts-hd": "DTS-HD",
+    "flac": "FLAC",
+    "opus": "Opus",
+    "atmos": "Atmos"
+}
+
+def parse_filename(file_name: str) -> dict:
+    """Extract title, season, episode, quality, codec and audio from a file name"""
+    return dict(_parse_filename(file_name))
+
+def get_parser_cache_info():
+    """Get hit/miss counts of the filename parser cache"""
+    return _parse_filename.cache_info()
+
+@lru_cache(maxsize=FILENAME_CACHE_SIZE)
+def _parse_filename(file_name: str) -> tuple:
+    """Parse a file name once; results are memoized per name"""
+    stem, _ = os.path.splitext(file_name)
+    stem = GROUP_TAG_RE.sub("", stem)
+    season = episode = ""
+    # Where the title ends: the first tag found in the name
+    title_end = len(stem)
+    
+    match = SEASON_EPISODE_RE.search(stem) or CROSS_EPISODE_RE.search(stem)
+    if match:
+        season, episode = f"{int(match.group(1)):02d}", f"{int(match.group(2)):02d}"
+        title_end = match.start()
+    else:
+        match = EPISODE_RE.search(stem)
+        if match:
+            episode = f"{int(match.group(1)):02d}"
+            title_end = match.start()
+        match = SEASON_RE.search(stem)
+        if match:
+            season = f"{int(match.group(1)):02d}"
+            title_end = min(title_end, match.start())
+    
+    quality = ""
+    match = QUALITY_RE.search(stem)
+    if match:
+        quality = f"{match.group(1)}p" if match.group(1) else "2160p"
+        title_end = min(title_end, match.start())
+    
+    codec = ""
+    match = CODEC_RE.search(stem)
+    if match:
+        codec = CODECS[match.group(1).lower().replace(".", "").replace(" ", "")]
+        title_end = min(title_end, match.start())
+    
+    # Audio can be several tags, e.g. DDP5.1 Atmos
+    audio = []
+    for match in AUDIO_RE.finditer(stem):
+        key = match.group(1).lower()
+        tag = AUDIO_CODECS.get(key) or AUDIO_CODECS[key.replace("-", "")]
+        if match.group(2):
+            tag += match.group(2)
+        if tag not in audio:
+            audio.append(tag)
+        title_end = min(title_end, match.start())
+    
+    match = YEAR_RE.search(stem)
+    if match and match.start() > 0:
+        title_end = min(title_end, match.start())
+    
+    title = SEPARATORS_RE.sub(" ", stem[:title_end]).strip(" -([")
+    
+    return (
+        ("title", title),
+        ("season", season),
+        ("episode", episode),
+        ("quality", quality),
+        ("codec", codec),
+        ("audio", " ".join(audio))
+    )
@@ -76,7 +76,7 @@ async def admins_command(client, message: Message):
             await message.reply_text("❌ You don't have permission to use this command!")
             return
         
-        admins = db.get_all_admins()
+        admins = await db.get_all_admins()
         
         text = "👨‍💼 **Current Admins**\n\n"
         
@@ -158,7 +158,7 @@ async def banned_command(client, message: Message):
             await message.reply_text("❌ You don't have permission to use this command!")
             return
         
-        banned_users = db.get_banned_users()
+        banned_users = await db.get_banned_users()
         
         text = "🚫 **Banned Users**\n\n"
         
@@ -212,7 +212,7 @@ async def delchnl_command(client, message: Message):
             await message.reply_text("❌ You don't have permission to use this command!")
             return
         
-        channels = db.get_all_force_sub_channels()
+        channels = await db.get_all_force_sub_channels()
         
         if not channels:
             await message.reply_text("❌ No channels added yet!")
@@ -241,7 +241,7 @@ async def listchnl_command(client, message: Message):
             await message.reply_text("❌ You don't have permission to use this command!")
             return
         
-        channels = db.get_all_force_sub_channels()
+        channels = await db.get_all_force_sub_channels()
         
         text = "📢 **Force Subscribe Channels**\n\n"
         
@@ -318,7 +318,7 @@ async def handle_admin_input(client, message: Message):
         if action == "waiting_admin_id":
             try:
                 admin_id = int(text)
-                db.add_admin(admin_id)
+                await db.add_admin(admin_id)
                 await message.reply_text(f"✅ User `{admin_id}` is now an admin!", parse_mode="markdown")
                 await send_log(app, f"Added admin: {admin_id}", user_id)
                 del admin_states[user_id]
@@ -328,7 +328,7 @@ async def handle_admin_input(client, message: Message):
         elif action == "waiting_remove_admin_id":
             try:
                 admin_id = int(text)
-                db.remove_admin(admin_id)
+                await db.remove_admin(admin_id)
                 await message.reply_text(f"✅ User `{admin_id}` is no longer an admin!", parse_mode="markdown")
                 await send_log(app, f"Removed admin: {admin_id}", user_id)
                 del admin_states[user_id]
@@ -338,7 +338,7 @@ async def handle_admin_input(client, message: Message):
         elif action == "waiting_ban_id":
             try:
                 ban_id = int(text)
-                db.ban_user(ban_id)
+                await db.ban_user(ban_id)
                 await message.reply_text(f"✅ User `{ban_id}` has been banned!", parse_mode="markdown")
                 await send_log(app, f"Banned user: {ban_id}", user_id)
                 del admin_states[user_id]
@@ -348,7 +348,7 @@ async def handle_admin_input(client, message: Message):
         elif action == "waiting_unban_id":
             try:
                 unban_id = int(text)
-                db.unban_user(unban_id)
+                await db.unban_user(unban_id)
                 await message.reply_text(f"✅ User `{unban_id}` has been unbanned!", parse_mode="markdown")
                 await send_log(app, f"Unbanned user: {unban_id}", user_id)
                 del admin_states[user_id]
@@ -357,14 +357,14 @@ async def handle_admin_input(client, message: Message):
                 
         elif action == "waiting_channel":
             channel = text.replace("@", "").strip()
-            db.add_force_sub_channel(channel)
+            await db.add_force_sub_channel(channel)
             await message.reply_text(f"✅ Channel `@{channel}` added for force subscribe!", parse_mode="markdown")
             await send_log(app, f"Added force sub channel: {channel}", user_id)
             del admin_states[user_id]
             
         elif action == "waiting_broadcast":
             # Get all users and send broadcast
-            all_users = db.get_leaderboard(limit=10000)
+            all_users = await db.get_leaderboard(limit=10000)
             success = 0
             failed = 0
             
@@ -397,7 +397,7 @@ async def remove_channel_callback(client, query):
             return
         
         channel = query.data.replace("remove_chnl_", "")
-        db.remove_force_sub_channel(channel)
+        await db.remove_force_sub_channel(channel)
         
         await query.edit_message_text(f"✅ Channel `@{channel}` removed!", parse_mode="markdown")
         await send_log(app, f"Removed force sub channel: {channel}", user_id)
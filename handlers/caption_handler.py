@@ -30,6 +30,7 @@ Send your desired caption as a message. This caption will be added to every file
 • Italic: `_text_`
 • Code: `` `code` ``
 • Mentions: `@username`
+• Placeholders: `{title}`, `{quality}`, `{audio}`, `{duration}` and the other rename format variables
 
 Send your caption now:
 """
@@ -54,7 +55,7 @@ async def see_caption_command(client, message: Message):
             await message.reply_text("❌ You are banned!")
             return
         
-        caption = db.get_caption(user_id)
+        caption = await db.get_caption(user_id)
         
         if caption:
             text = f"📝 **Your Current Caption:**\n\n{caption}"
@@ -87,10 +88,10 @@ async def del_caption_command(client, message: Message):
             await message.reply_text("❌ You are banned!")
             return
         
-        caption = db.get_caption(user_id)
+        caption = await db.get_caption(user_id)
         
         if caption:
-            db.delete_caption(user_id)
+            await db.delete_caption(user_id)
             await message.reply_text("✅ Caption deleted successfully!")
             await send_log(app, "User deleted caption", user_id)
         else:
@@ -114,7 +115,7 @@ async def handle_caption_input(client, message: Message):
             caption_text = message.text
             
             if caption_text:
-                db.set_caption(user_id, caption_text)
+                await db.set_caption(user_id, caption_text)
                 
                 # Create preview
                 preview = f"✅ Caption saved!\n\n**Preview:**\n{caption_text}"
@@ -186,7 +187,7 @@ async def del_caption_callback(client, query):
     try:
         user_id = query.from_user.id
         
-        db.delete_caption(user_id)
+        await db.delete_caption(user_id)
         
         await query.edit_message_text(
             "✅ Caption deleted successfully!"
@@ -20,7 +20,7 @@ async def metadata_command(client, message: Message):
             await message.reply_text("❌ You are banned!")
             return
         
-        metadata = db.get_metadata(user_id)
+        metadata = await db.get_metadata(user_id)
         
         if metadata:
             text = "📊 **Your Current Metadata**\n\n"
@@ -90,7 +90,7 @@ async def see_prefix_command(client, message: Message):
             await message.reply_text("❌ You are banned!")
             return
         
-        prefix = db.get_prefix(user_id)
+        prefix = await db.get_prefix(user_id)
         
         if prefix:
             text = f"📝 **Your Current Prefix:**\n`{prefix}`"
@@ -117,7 +117,7 @@ async def del_prefix_command(client, message: Message):
             await message.reply_text("❌ You are banned!")
             return
         
-        db.delete_prefix(user_id)
+        await db.delete_prefix(user_id)
         await message.reply_text("✅ Prefix deleted successfully!")
         await send_log(app, "User deleted prefix", user_id)
         
@@ -165,7 +165,7 @@ async def see_suffix_command(client, message: Message):
             await message.reply_text("❌ You are banned!")
             return
         
-        suffix = db.get_suffix(user_id)
+        suffix = await db.get_suffix(user_id)
         
         if suffix:
             text = f"📝 **Your Current Suffix:**\n`{suffix}`"
@@ -192,7 +192,7 @@ async def del_suffix_command(client, message: Message):
             await message.reply_text("❌ You are banned!")
             return
         
-        db.delete_suffix(user_id)
+        await db.delete_suffix(user_id)
         await message.reply_text("✅ Suffix deleted successfully!")
         await send_log(app, "User deleted suffix", user_id)
         
@@ -214,25 +214,25 @@ async def handle_metadata_input(client, message: Message):
             text = message.text
             
             if state == "waiting_prefix":
-                db.set_prefix(user_id, text)
+                await db.set_prefix(user_id, text)
                 await message.reply_text(f"✅ Prefix saved: `{text}`", parse_mode="markdown")
                 await send_log(app, f"User set prefix: {text}", user_id)
                 del metadata_states[user_id]
                 
             elif state == "waiting_suffix":
-                db.set_suffix(user_id, text)
+                await db.set_suffix(user_id, text)
                 await message.reply_text(f"✅ Suffix saved: `{text}`", parse_mode="markdown")
                 await send_log(app, f"User set suffix: {text}", user_id)
                 del metadata_states[user_id]
                 
             elif state == "waiting_title":
-                db.set_metadata(user_id, title=text)
+                await db.set_metadata(user_id, title=text)
                 await message.reply_text(f"✅ Title saved: `{text}`", parse_mode="markdown")
                 await send_log(app, f"User set title: {text}", user_id)
                 del metadata_states[user_id]
                 
             elif state == "waiting_author":
-                db.set_metadata(user_id, author=text)
+                await db.set_metadata(user_id, author=text)
                 await message.reply_text(f"✅ Author saved: `{text}`", parse_mode="markdown")
                 await send_log(app, f"User set author: {text}", user_id)
                 del metadata_states[user_id]
@@ -271,17 +271,17 @@ async def metadata_callback_handler(client, query):
             metadata_states[user_id] = {"state": f"waiting_{field}", "msg_id": msg.id}
             
         elif action == "del" and field == "prefix":
-            db.delete_prefix(user_id)
+            await db.delete_prefix(user_id)
             await query.edit_message_text("✅ Prefix deleted!")
             await send_log(app, "User deleted prefix", user_id)
             
         elif action == "del" and field == "suffix":
-            db.delete_suffix(user_id)
+            await db.delete_suffix(user_id)
             await query.edit_message_text("✅ Suffix deleted!")
             await send_log(app, "User deleted suffix", user_id)
             
         elif action == "clear" and field == "metadata":
-            db.set_metadata(user_id, title=None, author=None)
+            await db.delete_metadata(user_id)
             await query.edit_message_text("✅ Metadata cleared!")
             await send_log(app, "User cleared metadata", user_id)
             
@@ -1,11 +1,20 @@
 import logging
 import os
 import asyncio
-from pyrogram import filters
+import mimetypes
+from pyrogram import enums, filters
 from pyrogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton
+from config import ALBUM_WINDOW, AUTO_THUMBNAIL, MEDIA_PROBE
 from database import db
+from jobs import jobs
+from filename_parser import parse_filename
+from rename_template import PLACEHOLDERS, compile_format
+from result_cache import get_result_key, result_cache
+from thumbnails import thumbnails
+from media_probe import PROBE_FIELDS, media_probe
+from media_pipeline import CONTAINER_CODECS, TAG_CODECS, can_stream_copy, get_metadata_tags, media_pipeline
 from utils import (
-    parse_rename_format, sanitize_filename, get_file_extension,
+    sanitize_filename, get_file_extension,
     send_log, check_user_ban
 )
 from main import app
@@ -15,6 +24,9 @@ logger = logging.getLogger(__name__)
 # Store rename formats in memory temporarily
 rename_formats = {}
 
+# Album messages being collected, keyed by (user_id, media_group_id)
+album_buffers = {}
+
 @app.on_message(filters.command("autorename"))
 async def autorename_command(client, message: Message):
     """Handle /autorename command - Set custom rename format"""
@@ -33,7 +45,10 @@ Use these variables in your format:
 • {episode} - Episode number
 • {title} - File title
 • {quality} - Video quality
+• {codec} - Video codec
 • {audio} - Audio type
+• {language} - Audio language
+• {duration} - Running time
 
 **Examples:**
 `S{season}E{episode} - {title}`
@@ -47,7 +62,7 @@ Send your desired format as a message.
             [InlineKeyboardButton("❌ Cancel", callback_data="cancel_format")]
         ])
         
-        msg = await message.reply_text(help_text, reply_markup=keyboard, parse_mode="markdown")
+        msg = await message.reply_text(help_text, reply_markup=keyboard, parse_mode=enums.ParseMode.MARKDOWN)
         rename_formats[user_id] = {"state": "waiting_format", "msg_id": msg.id}
         
     except Exception as e:
@@ -64,7 +79,7 @@ async def showformat_command(client, message: Message):
             await message.reply_text("❌ You are banned!")
             return
         
-        format_str = db.get_rename_format(user_id)
+        format_str = await db.get_rename_format(user_id)
         
         if format_str:
             text = f"📝 **Your Current Format:**\n`{format_str}`"
@@ -75,7 +90,7 @@ async def showformat_command(client, message: Message):
             [InlineKeyboardButton("🔄 Change Format", callback_data="change_format")]
         ])
         
-        await message.reply_text(text, reply_markup=keyboard, parse_mode="markdown")
+        await message.reply_text(text, reply_markup=keyboard, parse_mode=enums.ParseMode.MARKDOWN)
         
     except Exception as e:
         logger.error(f"Error in showformat_command: {e}")
@@ -119,10 +134,10 @@ async def start_sequence_command(client, message: Message):
             await message.reply_text("❌ You are banned!")
             return
         
-        db.start_sequence(user_id)
+        await db.start_sequence(user_id)
         await message.reply_text(
             "✅ **Sequence Mode Started!**\n\nNow send multiple files. I'll rename them in order.\nUse /end_sequence when done.",
-            parse_mode="markdown"
+            parse_mode=enums.ParseMode.MARKDOWN
         )
         await send_log(app, f"User started sequence mode", user_id)
         
@@ -139,18 +154,196 @@ async def end_sequence_command(client, message: Message):
             await message.reply_text("❌ You are banned!")
             return
         
-        files = db.end_sequence(user_id)
+        sequence_id, count = await db.end_sequence(user_id)
         
-        if files:
-            text = f"✅ Sequence Ended!\n\n📊 Total files processed: {len(files)}"
-            await message.reply_text(text)
-            await send_log(app, f"User ended sequence with {len(files)} files", user_id)
+        if count:
+            # The whole sequence is one job so its files go out in order
+            job = await jobs.submit(user_id, process_sequence, message, sequence_id, count)
+            await reply_queue_position(message, job)
         else:
             await message.reply_text("❌ No files in sequence!")
         
     except Exception as e:
         logger.error(f"Error in end_sequence_command: {e}")
 
+async def process_sequence(message: Message, sequence_id: int, count: int):
+    """Rename and send back the files of an ended sequence"""
+    user_id = message.from_user.id
+    status_msg = await message.reply_text(f"⏳ Renaming {count} files in order...")
+    
+    renamed = 0
+    failed = 0
+    try:
+        profile = await db.get_user_profile(user_id)
+        
+        # Stream the files back in order instead of loading them all at once
+        async for file_data in db.iter_sequence(user_id, sequence_id):
+            try:
+                await rename_and_send(user_id, file_data, profile)
+                renamed += 1
+            except Exception as e:
+                logger.error(f"Error renaming sequence file {file_data['file_name']}: {e}")
+                failed += 1
+    finally:
+        await db.clear_sequence(user_id, sequence_id)
+        await status_msg.delete()
+    
+    text = f"✅ Sequence Ended!\n\n📊 Total files processed: {renamed}"
+    if failed:
+        text += f"\n❌ {failed} of {count} files could not be processed!"
+    await message.reply_text(text)
+    await send_log(app, f"User ended sequence with {renamed} files renamed, {failed} failed", user_id)
+
+async def process_file(message: Message, file_data: dict, profile: dict):
+    """Rename and send back a single file"""
+    user_id = message.from_user.id
+    try:
+        processing_msg = await message.reply_text("⏳ Processing your file...")
+        
+        new_name = await rename_and_send(user_id, file_data, profile)
+        
+        await processing_msg.delete()
+        await send_log(app, f"File renamed: {file_data['file_name']} → {new_name}", user_id)
+    except Exception as e:
+        await message.reply_text(f"❌ Error processing file: {str(e)}")
+        raise
+
+async def process_album(message: Message, files: list, profile: dict):
+    """Rename and send back the files of an album in order"""
+    user_id = message.from_user.id
+    status_msg = await message.reply_text(f"⏳ Processing album of {len(files)} files...")
+    
+    renamed = []
+    failed = 0
+    for file_data in files:
+        try:
+            new_name = await rename_and_send(user_id, file_data, profile)
+            renamed.append(f"{file_data['file_name']} → {new_name}")
+        except Exception as e:
+            logger.error(f"Error renaming album file {file_data['file_name']}: {e}")
+            failed += 1
+    
+    await status_msg.delete()
+    if failed:
+        await message.reply_text(f"❌ {failed} of {len(files)} files could not be processed!")
+    await send_log(app, f"Album renamed: {len(renamed)} files\n" + "\n".join(renamed), user_id)
+
+async def reply_queue_position(message: Message, job):
+    """Tell the user where their job is in line if it has to wait"""
+    position = jobs.get_position(job)
+    if position:
+        await message.reply_text(f"🕒 Queued at position #{position}, your file will be processed shortly.")
+
+async def rename_and_send(user_id: int, file_data: dict, profile: dict) -> str:
+    """Rename a file with the user's settings and send it back"""
+    # Increment user's rename count
+    await db.increment_rename_count(user_id)
+    
+    # A file already processed with the same settings is sent as is
+    key = get_result_key(file_data, profile)
+    cached = result_cache.get(key) if key else None
+    if cached:
+        await app.send_document(
+            chat_id=user_id,
+            document=cached["file_id"],
+            file_name=cached["file_name"],
+            caption=cached["caption"],
+            parse_mode=enums.ParseMode.MARKDOWN
+        )
+        return cached["file_name"]
+    
+    original_name = file_data["file_name"]
+    file_size = file_data["file_size"]
+    video = is_video(file_data)
+    
+    # Apply prefix and suffix if set
+    prefix = profile["prefix"] or ""
+    suffix = profile["suffix"] or ""
+    
+    # Fill the format with the season, episode, quality, ... found in the original name
+    name, ext = os.path.splitext(original_name)
+    info = parse_filename(original_name)
+    info["title"] = info["title"] or name
+    
+    # Names often lie or leave things out; what the file's headers say wins. Only probe
+    # when the format or caption shows a probed value or a conversion needs real codec names
+    template = compile_format(profile["rename_format"])
+    fields = template.fields | (compile_format(profile["caption"]).fields if profile["caption"] else frozenset())
+    converting = bool(profile["media_format"]) and profile["media_format"] != ext.lstrip(".").lower()
+    probe = {}
+    if MEDIA_PROBE and video and media_pipeline.probe_available and (converting or fields & PROBE_FIELDS):
+        probe = await media_probe.get(app, file_data)
+        info.update({key: value for key, value in probe.items() if key in PLACEHOLDERS and value})
+    new_name = template.render(info)
+    new_name = sanitize_filename(prefix + new_name + suffix + ext)
+    
+    # Convert videos to the user's output container only when their codecs allow a stream copy
+    container = profile["media_format"] if video else None
+    video_codec = probe.get("video_codec") or TAG_CODECS.get(info["codec"])
+    audio_codecs = probe.get("audio_codecs")
+    if not audio_codecs:
+        audio_tags = [tag.rstrip("0123456789.") for tag in info["audio"].split()]
+        audio_codecs = [TAG_CODECS[tag] for tag in audio_tags if tag in TAG_CODECS]
+    if container and (
+        container == ext.lstrip(".").lower()
+        or not can_stream_copy(container, video_codec, audio_codecs)
+    ):
+        container = None
+    
+    # Metadata and containers are changed in the file itself, which means downloading and re-uploading it;
+    # so does a thumbnail, since Telegram keeps the old one when a file is resent by file_id.
+    # Other documents and files too big for the scratch quota are only renamed
+    tags = get_metadata_tags(profile["metadata"])
+    remux = bool(tags or container)
+    wants_thumb = bool(profile["thumbnail"]) or (AUTO_THUMBNAIL and media_pipeline.available)
+    upload = video and (remux or wants_thumb) and media_pipeline.can_process(file_size, remux)
+    
+    # Attach the user's thumbnail to uploads, resized once and reused from the disk cache
+    thumb = None
+    if profile["thumbnail"] and upload:
+        try:
+            thumb = await thumbnails.get(app, profile["thumbnail"]["file_id"], profile["thumbnail"]["file_unique_id"])
+        except Exception as e:
+            logger.error(f"Error preparing thumbnail for user {user_id}: {e}")
+    elif AUTO_THUMBNAIL and upload:
+        # Otherwise use a frame from the start of the video
+        try:
+            thumb = await thumbnails.get_frame(app, file_data)
+        except Exception as e:
+            logger.error(f"Error extracting a thumbnail from {original_name}: {e}")
+    
+    # Send the file with new name
+    result = {}
+    async def send(document, converted=None):
+        file_name = f"{os.path.splitext(new_name)[0]}.{converted}" if converted else new_name
+        # Use the custom caption if the user has set one, with its placeholders filled in
+        if profile["caption"]:
+            caption = compile_format(profile["caption"]).render(info)
+        else:
+            caption = f"✅ **Renamed!**\n📁 {file_name}\n📊 Size: {file_size / (1024*1024):.2f} MB"
+            # Only known if the file was probed for the format
+            if info.get("duration"):
+                caption += f"\n⏱ Duration: {info['duration']}"
+        result.update(file_name=file_name, caption=caption)
+        return await app.send_document(
+            chat_id=user_id,
+            document=document,
+            file_name=file_name,
+            caption=caption,
+            thumb=thumb,
+            parse_mode=enums.ParseMode.MARKDOWN
+        )
+    
+    if upload:
+        sent = await media_pipeline.run(app, file_data, tags, send, container)
+    else:
+        sent = await send(file_data["file_id"])
+    
+    if key and sent and sent.document:
+        result_cache.set(key, {"file_id": sent.document.file_id, **result})
+    
+    return result["file_name"]
+
 # Handle file rename when user sends file
 @app.on_message(filters.document | filters.video)
 async def handle_file_rename(client, message: Message):
@@ -163,61 +356,110 @@ async def handle_file_rename(client, message: Message):
             await message.reply_text("❌ You are banned!")
             return
         
-        # Check if user is waiting for format input
-        if user_id in rename_formats and rename_formats[user_id]["state"] == "waiting_format":
-            # Process format input
-            format_text = message.text
-            if format_text:
-                db.set_rename_format(user_id, format_text)
-                await message.reply_text(f"✅ Format saved: `{format_text}`", parse_mode="markdown")
-                del rename_formats[user_id]
-                return
-        
-        # Get file info
-        file = message.document or message.video
-        original_name = file.file_name or "unnamed"
-        file_size = file.file_size
-        
-        # Show processing message
-        processing_msg = await message.reply_text("⏳ Processing your file...")
-        
-        # Get user's rename format
-        format_str = db.get_rename_format(user_id)
-        
-        if not format_str:
-            await processing_msg.delete()
-            await message.reply_text("❌ You haven't set a rename format!\n\nUse /autorename first.")
+        # Albums arrive as one message per file, collect them into one batch
+        if message.media_group_id:
+            key = (user_id, message.media_group_id)
+            if key not in album_buffers:
+                album_buffers[key] = {"messages": [], "task": asyncio.create_task(collect_album(key))}
+            album_buffers[key]["messages"].append(message)
             return
         
-        # Apply prefix and suffix if set
-        prefix = db.get_prefix(user_id) or ""
-        suffix = db.get_suffix(user_id) or ""
-        
-        # Parse the format
-        name, ext = os.path.splitext(original_name)
-        new_name = parse_rename_format(format_str, title=name, quality="720p", audio="AAC")
-        new_name = prefix + new_name + suffix + ext
-        new_name = sanitize_filename(new_name)
-        
-        # Increment user's rename count
-        db.increment_rename_count(user_id)
-        
-        # Send the file with new name
-        await app.send_document(
-            chat_id=user_id,
-            document=file.file_id,
-            file_name=new_name,
-            caption=f"✅ **Renamed!**\n📁 {new_name}\n📊 Size: {file_size / (1024*1024):.2f} MB",
-            parse_mode="markdown"
-        )
-        
-        await processing_msg.delete()
-        await send_log(app, f"File renamed: {original_name} → {new_name}", user_id)
+        await enqueue_files(message, [get_file_data(message)])
         
     except Exception as e:
         logger.error(f"Error in handle_file_rename: {e}")
         await message.reply_text(f"❌ Error processing file: {str(e)}")
 
+def get_file_data(message: Message) -> dict:
+    """Get the file details needed for renaming from a message"""
+    file = message.document or message.video
+    return {
+        "file_id": file.file_id,
+        "file_unique_id": file.file_unique_id,
+        "file_name": file.file_name or "unnamed",
+        "file_size": file.file_size,
+        "mime_type": file.mime_type
+    }
+
+def is_video(file_data: dict) -> bool:
+    """Whether a file is a video, by MIME type or else by extension"""
+    mime_type = file_data.get("mime_type") or mimetypes.guess_type(file_data["file_name"])[0]
+    return bool(mime_type) and mime_type.startswith("video/")
+
+async def collect_album(key):
+    """Wait for the rest of an album, then queue it as one batch"""
+    await asyncio.sleep(ALBUM_WINDOW)
+    messages = sorted(album_buffers.pop(key)["messages"], key=lambda message: message.id)
+    try:
+        await enqueue_files(messages[0], [get_file_data(message) for message in messages])
+    except Exception as e:
+        logger.error(f"Error in collect_album: {e}")
+        await messages[0].reply_text(f"❌ Error processing album: {str(e)}")
+
+async def enqueue_files(message: Message, files: list):
+    """Add files to the active sequence or queue them for renaming"""
+    user_id = message.from_user.id
+    
+    # Load all rename settings in a single query
+    profile = await db.get_user_profile(user_id)
+    
+    if not profile["rename_format"]:
+        await message.reply_text("❌ You haven't set a rename format!\n\nUse /autorename first.")
+        return
+    
+    # In sequence mode files are collected and sent back on /end_sequence
+    if profile["sequence_active"]:
+        positions = [await db.add_to_sequence(user_id, file_data) for file_data in files]
+        if positions[0]:
+            if len(positions) == 1:
+                await message.reply_text(f"📥 Added to sequence (#{positions[0]})")
+            else:
+                await message.reply_text(f"📥 Added {len(positions)} files to sequence (#{positions[0]}-#{positions[-1]})")
+            return
+    
+    # Renaming happens on the job workers so big batches don't block other users
+    if len(files) == 1:
+        job = await jobs.submit(user_id, process_file, message, files[0], profile, size=files[0]["file_size"])
+    else:
+        total_size = sum(file_data["file_size"] for file_data in files)
+        job = await jobs.submit(user_id, process_album, message, files, profile, size=total_size)
+    await reply_queue_position(message, job)
+
+# Handle text input for rename format; commands such as /autorename itself
+# also reach this group and must not be taken as the format
+@app.on_message(filters.text & filters.private & ~filters.regex(r"^/"), group=4)
+async def handle_format_input(client, message: Message):
+    """Handle rename format text input"""
+    try:
+        user_id = message.from_user.id
+        
+        if await check_user_ban(user_id):
+            return
+        
+        # Check if user is waiting for format input
+        if user_id in rename_formats and rename_formats[user_id]["state"] == "waiting_format":
+            format_text = message.text
+            
+            if format_text:
+                # Reject typos like {Season} or {ep} instead of leaving them in file names
+                template = compile_format(format_text)
+                if template.unknown:
+                    unknown = ", ".join(f"{{{name}}}" for name in template.unknown)
+                    allowed = ", ".join(f"{{{name}}}" for name in PLACEHOLDERS)
+                    await message.reply_text(
+                        f"❌ Unknown variable: {unknown}\n\nAvailable variables: {allowed}\n\nSend the format again."
+                    )
+                    return
+                
+                await db.set_rename_format(user_id, format_text)
+                # Leave the waiting state before replying so a failed reply can't keep it
+                del rename_formats[user_id]
+                await message.reply_text(f"✅ Format saved: `{format_text}`", parse_mode=enums.ParseMode.MARKDOWN)
+                await send_log(app, f"User set rename format: {format_text}", user_id)
+    
+    except Exception as e:
+        logger.error(f"Error in handle_format_input: {e}")
+
 # Callback handlers
 @app.on_callback_query(filters.regex("^cancel_format$"))
 async def cancel_format_callback(client, query):
@@ -238,10 +480,14 @@ async def media_callback(client, query):
         format_type = query.data.replace("media_", "")
         user_id = query.from_user.id
         
-        # Store user's preferred media format
-        db.set_metadata(user_id, title=f"media_format_{format_type}")
+        if format_type not in CONTAINER_CODECS:
+            await query.answer("❌ Unknown format!")
+            return
+        
+        # Store user's preferred output container
+        await db.set_media_format(user_id, format_type)
         
-        await query.edit_message_text(f"✅ Output format set to: **.{format_type.upper()}**", parse_mode="markdown")
+        await query.edit_message_text(f"✅ Output format set to: **.{format_type.upper()}**", parse_mode=enums.ParseMode.MARKDOWN)
         await send_log(app, f"User set output format to {format_type}", user_id)
         
     except Exception as e:
@@ -22,7 +22,7 @@ async def start_command(client, message: Message):
             return
         
         # Add user to database
-        db.add_user(user_id, message.from_user.username, message.from_user.first_name)
+        await db.add_user(user_id, message.from_user.username, message.from_user.first_name)
         
         # Create inline keyboard
         keyboard = InlineKeyboardMarkup([
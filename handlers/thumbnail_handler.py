@@ -21,7 +21,7 @@ async def viewthumb_command(client, message: Message):
             await message.reply_text("❌ You are banned!")
             return
         
-        thumb = db.get_thumbnail(user_id)
+        thumb = await db.get_thumbnail(user_id)
         
         if thumb:
             keyboard = InlineKeyboardMarkup([
@@ -60,10 +60,10 @@ async def delthumb_command(client, message: Message):
             await message.reply_text("❌ You are banned!")
             return
         
-        thumb = db.get_thumbnail(user_id)
+        thumb = await db.get_thumbnail(user_id)
         
         if thumb:
-            db.delete_thumbnail(user_id)
+            await db.delete_thumbnail(user_id)
             await message.reply_text("✅ Thumbnail deleted successfully!")
             await send_log(app, "User deleted thumbnail", user_id)
         else:
@@ -85,10 +85,10 @@ async def handle_thumbnail_upload(client, message: Message):
         
         # Check if user is requesting to set thumbnail
         if user_id in thumbnail_states and thumbnail_states[user_id].get("action") == "waiting_thumb":
-            photo = message.photo[-1]  # Get highest quality photo
+            photo = message.photo  # Highest quality size of the photo
             
             # Save thumbnail
-            db.set_thumbnail(user_id, photo.file_id, photo.file_unique_id)
+            await db.set_thumbnail(user_id, photo.file_id, photo.file_unique_id)
             
             await message.reply_text(
                 "✅ Thumbnail saved successfully!\n\n📁 This image will be used for all your renamed files.",
@@ -109,7 +109,7 @@ async def upload_thumb_callback(client, query):
         user_id = query.from_user.id
         
         await query.edit_message_text("📸 Send me a photo to set as thumbnail")
-        thumbnail_states[user_id] = "waiting_thumb"
+        thumbnail_states[user_id] = {"action": "waiting_thumb"}
     except Exception as e:
         logger.error(f"Error in upload_thumb_callback: {e}")
 
@@ -120,7 +120,7 @@ async def change_thumb_callback(client, query):
         user_id = query.from_user.id
         
         await query.edit_message_text("📸 Send me a new photo to update thumbnail")
-        thumbnail_states[user_id] = "waiting_thumb"
+        thumbnail_states[user_id] = {"action": "waiting_thumb"}
     except Exception as e:
         logger.error(f"Error in change_thumb_callback: {e}")
 
@@ -130,7 +130,7 @@ async def delete_thumb_callback(client, query):
     try:
         user_id = query.from_user.id
         
-        db.delete_thumbnail(user_id)
+        await db.delete_thumbnail(user_id)
         
         await query.edit_message_caption(
             caption="✅ Thumbnail deleted successfully!"
@@ -2,11 +2,31 @@ import logging
 from pyrogram import filters
 from pyrogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton
 from database import db
-from utils import send_log, check_user_ban, create_leaderboard_text
+from utils import send_log, check_user_ban
+from jobs import jobs
+from leaderboard import leaderboard
+from rate_limiter import limiter
+from result_cache import result_cache
+from media_pipeline import media_pipeline
+from scratch import scratch
+from media_probe import media_probe
+from log_sender import log_sender
 from main import app
 
 logger = logging.getLogger(__name__)
 
+async def build_leaderboard_text(user_id: int) -> str:
+    """Build the leaderboard snapshot text with the user's own position"""
+    text = await leaderboard.get_text()
+    
+    # Get user's own position
+    rank = await leaderboard.get_user_rank(user_id)
+    if rank:
+        text += f"\n\n👤 **Your Position:** #{rank['rank']}"
+        text += f"\n📊 **Your Files Renamed:** {rank['rename_count']}"
+    
+    return text
+
 @app.on_message(filters.command("leaderboard"))
 async def leaderboard_command(client, message: Message):
     """Handle /leaderboard command"""
@@ -17,24 +37,7 @@ async def leaderboard_command(client, message: Message):
             await message.reply_text("❌ You are banned!")
             return
         
-        # Get top 10 users
-        users = db.get_leaderboard(limit=10)
-        
-        text = create_leaderboard_text(users, limit=10)
-        
-        # Get user's own position
-        all_users = db.get_leaderboard(limit=1000)
-        user_position = None
-        for idx, user in enumerate(all_users, 1):
-            if user['user_id'] == user_id:
-                user_position = idx
-                break
-        
-        if user_position:
-            text += f"\n\n👤 **Your Position:** #{user_position}"
-            user_data = db.get_user(user_id)
-            if user_data:
-                text += f"\n📊 **Your Files Renamed:** {user_data.get('rename_count', 0)}"
+        text = await build_leaderboard_text(user_id)
         
         keyboard = InlineKeyboardMarkup([
             [InlineKeyboardButton("🔄 Refresh", callback_data="refresh_leaderboard")]
@@ -120,22 +123,7 @@ async def refresh_leaderboard_callback(client, query):
         
         await query.answer("🔄 Refreshing...", show_alert=False)
         
-        users = db.get_leaderboard(limit=10)
-        text = create_leaderboard_text(users, limit=10)
-        
-        # Get user's own position
-        all_users = db.get_leaderboard(limit=1000)
-        user_position = None
-        for idx, user in enumerate(all_users, 1):
-            if user['user_id'] == user_id:
-                user_position = idx
-                break
-        
-        if user_position:
-            text += f"\n\n👤 **Your Position:** #{user_position}"
-            user_data = db.get_user(user_id)
-            if user_data:
-                text += f"\n📊 **Your Files Renamed:** {user_data.get('rename_count', 0)}"
+        text = await build_leaderboard_text(user_id)
         
         keyboard = InlineKeyboardMarkup([
             [InlineKeyboardButton("🔄 Refresh", callback_data="refresh_leaderboard")]
@@ -154,22 +142,7 @@ async def leaderboard_callback(client, query):
         
         await query.answer()
         
-        users = db.get_leaderboard(limit=10)
-        text = create_leaderboard_text(users, limit=10)
-        
-        # Get user's own position
-        all_users = db.get_leaderboard(limit=1000)
-        user_position = None
-        for idx, user in enumerate(all_users, 1):
-            if user['user_id'] == user_id:
-                user_position = idx
-                break
-        
-        if user_position:
-            text += f"\n\n👤 **Your Position:** #{user_position}"
-            user_data = db.get_user(user_id)
-            if user_data:
-                text += f"\n📊 **Your Files Renamed:** {user_data.get('rename_count', 0)}"
+        text = await build_leaderboard_text(user_id)
         
         keyboard = InlineKeyboardMarkup([
             [InlineKeyboardButton("🔄 Refresh", callback_data="refresh_leaderboard")],
@@ -193,6 +166,14 @@ async def status_command(client, message: Message):
         
         # Get bot statistics
         me = await app.get_me()
+        cache = db.get_cache_stats()
+        queue = jobs.get_stats()
+        outbound = limiter.get_stats()
+        results = result_cache.stats()
+        remux = media_pipeline.stats()
+        space = scratch.stats()
+        probes = media_probe.stats()
+        logs = log_sender.stats()
         
         status_text = f"""
 🤖 **Bot Status**
@@ -206,6 +187,15 @@ async def status_command(client, message: Message):
 
 **Server Status:** ✅ Running
 **Database:** ✅ Connected
+**Settings Cache:** {cache['size']}/{cache['max_size']} entries, {cache['hit_rate']:.0%} hits ({cache['hits']} hits, {cache['misses']} misses, {cache['evictions']} evictions)
+**Pending Counter Writes:** {db.get_pending_rename_ops()}
+**Result Cache:** {results['size']}/{results['max_size']} files, {results['hit_rate']:.0%} hits ({results['hits']} hits, {results['misses']} misses)
+**Remux:** {remux['remuxed']} files, {remux['remuxed_bytes'] / 1024**3:.2f} GB at {remux['seconds_per_gb']:.1f} s/GB, {remux['failed']} fell back to rename-only, {remux['frames']} frames extracted
+**Media Probe:** {probes['size']} files, {probes['hit_rate']:.0%} hits, {remux['probed_bytes'] / 1024**2:.0f} MB read for {remux['probes']} probes, {probes['failed']} failed
+**Scratch Space:** {space['used'] / 1024**2:.0f}/{space['quota'] / 1024**2:.0f} MB reserved, {space['waiting']} jobs waiting for space
+**Job Queue:** {queue['depth']} waiting ({queue['users_waiting']} users), {queue['in_flight']}/{queue['workers']} in flight, wait avg {queue['wait_avg']:.1f}s / p95 {queue['wait_p95']:.1f}s, {queue['processed']} done, {queue['failed']} failed
+**Outbound API:** {outbound['calls']} calls, {outbound['throttled']} throttled, {outbound['flood_waits']} FloodWaits, {outbound['retried']} retried, {outbound['failed']} failed
+**Log Channel:** {logs['pending']} queued, {logs['sent']} sent, {logs['dropped']} dropped
 **Response Time:** ⚡ Fast
 
 Last updated: Just now
@@ -0,0 +1,213 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from collections import Counter, defaultdict, deque
+from config import OWNER_ID, JOB_WORKERS, JOB_USER_CONCURRENCY, JOB_QUANTUM, JOB_PRIORITY_BOOST
+from database import db
+
+logger = logging.getLogger(__name__)
+
+class Job:
+    """A unit of file processing work queued for a user"""
+    
+    _counter = itertools.count()
+    
+    def __init__(self, user_id, func, *args, size=None):
+        self.user_id = user_id
+        self.func = func
+        self.args = args
+        self.size = size
+        # Smallest file first within a user, unsized jobs last, FIFO on ties
+        self.sort_key = (size is None, size or 0, next(self._counter))
+        self.enqueued_at = time.monotonic()
+        self.started_at = None
+        self.done = asyncio.get_running_loop().create_future()
+    
+    @property
+    def wait_time(self):
+        """Seconds the job waited before a worker picked it up"""
+        if self.started_at is None:
+            return time.monotonic() - self.enqueued_at
+        return self.started_at - self.enqueued_at
+    
+    def __lt__(self, other):
+        return self.sort_key < other.sort_key
+
+class JobQueue:
+    """Per-user job queues served by a bounded pool of async workers
+
+    The number of workers is the global maximum of jobs in flight. A user
+    never has more than user_concurrency jobs running.
+
+    Users are scheduled with deficit round robin: every turn a waiting
+    user is credited quantum bytes (times priority_boost for admins and
+    the owner) and may start a job once the credit covers its file size.
+    Light users therefore get through between a heavy user's multi-GB
+    files. Within a user the smallest file goes first.
+    """
+    
+    def __init__(
+        self,
+        workers=JOB_WORKERS,
+        user_concurrency=JOB_USER_CONCURRENCY,
+        quantum=JOB_QUANTUM,
+        priority_boost=JOB_PRIORITY_BOOST
+    ):
+        self.workers = workers
+        self.user_concurrency = user_concurrency
+        self.quantum = quantum
+        self.priority_boost = priority_boost
+        self.pending = defaultdict(list)
+        self.running = Counter()
+        self.deficit = Counter()
+        # Users that have waiting jobs and are below their concurrency cap
+        self.ready = deque()
+        self._condition = asyncio.Condition()
+        self._tasks = []
+        self.wait_times = deque(maxlen=1000)
+        self.processed = 0
+        self.failed = 0
+    
+    async def submit(self, user_id, func, *args, size=None):
+        """Queue func(*args) for a user and return the job
+
+        size is the file size in bytes; jobs without one cost a full quantum.
+        """
+        job = Job(user_id, func, *args, size=size)
+        async with self._condition:
+            heapq.heappush(self.pending[user_id], job)
+            self._mark_ready(user_id)
+            self._condition.notify()
+        return job
+    
+    def get_position(self, job):
+        """Position of the job in line, 0 if a worker picks it up right away"""
+        user_queue = self.pending.get(job.user_id)
+        if not user_queue or job not in user_queue:
+            return 0
+        
+        # An estimate: users are served in turns, so every other user gets
+        # at most as many jobs in before this one as this user has ahead of it
+        own_ahead = sum(1 for other in user_queue if other < job)
+        ahead = own_ahead + sum(
+            min(len(jobs), own_ahead + 1)
+            for user_id, jobs in self.pending.items()
+            if user_id != job.user_id
+        )
+        # Idle workers pick up the first jobs in line straight away
+        idle = self.workers - self.in_flight
+        if self.running[job.user_id] + own_ahead < self.user_concurrency and ahead < idle:
+            return 0
+        return max(ahead - idle, 0) + 1
+    
+    @property
+    def in_flight(self):
+        """Number of jobs currently being processed"""
+        return sum(self.running.values())
+    
+    @property
+    def depth(self):
+        """Number of jobs waiting for a worker"""
+        return sum(len(jobs) for jobs in self.pending.values())
+    
+    def get_stats(self):
+        """Get queue depth, jobs in flight and wait time metrics"""
+        waits = sorted(self.wait_times)
+        return {
+            "depth": self.depth,
+            "in_flight": self.in_flight,
+            "workers": self.workers,
+            "users_waiting": len(self.pending),
+            "processed": self.processed,
+            "failed": self.failed,
+            "wait_avg": sum(waits) / len(waits) if waits else 0.0,
+            "wait_p95": waits[int(0.95 * (len(waits) - 1))] if waits else 0.0
+        }
+    
+    def _mark_ready(self, user_id):
+        if (
+            self.pending.get(user_id)
+            and self.running[user_id] < self.user_concurrency
+            and user_id not in self.ready
+        ):
+            self.ready.append(user_id)
+    
+    def get_weight(self, user_id):
+        """Scheduling weight of a user, boosted for admins and the owner"""
+        if user_id == OWNER_ID or db.is_admin(user_id):
+            return self.priority_boost
+        return 1
+    
+    def _cost(self, job):
+        return self.quantum if job.size is None else job.size
+    
+    def _pick_user(self):
+        """Deficit round robin over the ready users"""
+        while True:
+            user_id = self.ready[0]
+            if self.deficit[user_id] >= self._cost(self.pending[user_id][0]):
+                return self.ready.popleft()
+            self.deficit[user_id] += self.quantum * self.get_weight(user_id)
+            self.ready.rotate(-1)
+    
+    async def _next_job(self):
+        """Wait for the next user in turn and take their smallest job"""
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.ready)
+            user_id = self._pick_user()
+            job = heapq.heappop(self.pending[user_id])
+            self.deficit[user_id] -= self._cost(job)
+            if not self.pending[user_id]:
+                # Idle users don't bank credit
+                del self.pending[user_id]
+                del self.deficit[user_id]
+            self.running[user_id] += 1
+            # Back of the line for the user's next job
+            self._mark_ready(user_id)
+            return job
+    
+    async def _finish(self, job):
+        async with self._condition:
+            self.running[job.user_id] -= 1
+            if not self.running[job.user_id]:
+                del self.running[job.user_id]
+            self._mark_ready(job.user_id)
+            self._condition.notify_all()
+    
+    async def _worker(self):
+        while True:
+            job = await self._next_job()
+            job.started_at = time.monotonic()
+            self.wait_times.append(job.wait_time)
+            try:
+                result = await job.func(*job.args)
+                self.processed += 1
+                if not job.done.done():
+                    job.done.set_result(result)
+            except asyncio.CancelledError:
+                job.done.cancel()
+                raise
+            except Exception as e:
+                # Jobs report their own errors to the user, the queue only logs them
+                self.failed += 1
+                logger.error(f"Error processing job for user {job.user_id}: {e}")
+                if not job.done.done():
+                    job.done.set_result(None)
+            finally:
+                await self._finish(job)
+    
+    def start(self):
+        """Start the worker pool"""
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+    
+    def stop(self):
+        """Stop the workers, cancelling the jobs they are running"""
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+
+# Initialize job queue instance
+jobs = JobQueue()
@@ -0,0 +1,67 @@
+import asyncio
+import logging
+from datetime import datetime
+from config import LEADERBOARD_SIZE, LEADERBOARD_REFRESH_INTERVAL
+from database import db
+from utils import create_leaderboard_text
+
+logger = logging.getLogger(__name__)
+
+class LeaderboardSnapshot:
+    """Top users and rendered leaderboard text, rebuilt on a schedule"""
+    
+    def __init__(self, size=LEADERBOARD_SIZE, interval=LEADERBOARD_REFRESH_INTERVAL):
+        self.size = size
+        self.interval = interval
+        self.users = []
+        self.text = None
+        self.as_of = None
+        self._task = None
+    
+    async def refresh(self):
+        """Rebuild the snapshot from the users collection"""
+        users = await db.get_leaderboard(limit=self.size)
+        self.text = create_leaderboard_text(users, limit=self.size)
+        self.users = users
+        self.as_of = datetime.now()
+    
+    async def get_text(self):
+        """Get the rendered leaderboard, building it on first use"""
+        if self.as_of is None:
+            await self.refresh()
+        return self.text + f"\n🕒 As of {self.as_of.strftime('%H:%M:%S')}"
+    
+    async def get_user_rank(self, user_id):
+        """Get user's position, from the snapshot when the user is in it"""
+        if self.as_of is None:
+            await self.refresh()
+        
+        for user in self.users:
+            if user.get('user_id') == user_id:
+                rename_count = user.get('rename_count', 0)
+                higher = sum(1 for other in self.users if other.get('rename_count', 0) > rename_count)
+                return {"rank": higher + 1, "rename_count": rename_count}
+        
+        return await db.get_user_rank(user_id)
+    
+    async def _run(self):
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.error(f"Error refreshing leaderboard: {e}")
+            await asyncio.sleep(self.interval)
+    
+    def start(self):
+        """Start refreshing the snapshot in the background"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+    
+    def stop(self):
+        """Stop the background refresh"""
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+# Initialize leaderboard snapshot instance
+leaderboard = LeaderboardSnapshot()
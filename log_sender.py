@@ -0,0 +1,78 @@
+import asyncio
+import logging
+from collections import deque
+from config import LOG_CHANNEL, LOG_QUEUE_SIZE
+
+logger = logging.getLogger(__name__)
+
+# Telegram's message length limit
+MAX_MESSAGE_LENGTH = 4096
+
+class LogSender:
+    """Sends LOG_CHANNEL messages from a background task
+
+    Callers only queue a message, so jobs never wait on the log
+    channel's rate limit. Messages that pile up while the sender waits
+    for its budget are merged into as few sends as possible; beyond
+    max_pending the oldest are dropped.
+    """
+    
+    def __init__(self, max_pending=LOG_QUEUE_SIZE):
+        self.max_pending = max_pending
+        self.pending = deque()
+        self.sent = 0
+        self.dropped = 0
+        self._app = None
+        self._wakeup = asyncio.Event()
+        self._task = None
+    
+    def enqueue(self, app, text: str):
+        """Queue a message for the log channel"""
+        if len(self.pending) >= self.max_pending:
+            self.pending.popleft()
+            self.dropped += 1
+        self.pending.append(text[:MAX_MESSAGE_LENGTH])
+        self._app = app
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        self._wakeup.set()
+    
+    def _next_batch(self):
+        """Pop queued messages that fit together in one Telegram message"""
+        batch = [self.pending.popleft()]
+        length = len(batch[0])
+        while self.pending and length + 2 + len(self.pending[0]) <= MAX_MESSAGE_LENGTH:
+            text = self.pending.popleft()
+            batch.append(text)
+            length += 2 + len(text)
+        return batch
+    
+    async def _run(self):
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            while self.pending:
+                batch = self._next_batch()
+                try:
+                    # Paced by the rate limiter's log channel bucket
+                    await self._app.send_message(LOG_CHANNEL, "\n\n".join(batch))
+                    self.sent += len(batch)
+                except Exception as e:
+                    logger.error(f"Error sending log: {e}")
+    
+    def stop(self):
+        """Stop sending, dropping queued messages"""
+        if self._task:
+            self._task.cancel()
+            self._task = None
+    
+    def stats(self):
+        """Get queued, sent and dropped message counts"""
+        return {
+            "pending": len(self.pending),
+            "sent": self.sent,
+            "dropped": self.dropped
+        }
+
+# Initialize log sender instance
+log_sender = LogSender()
@@ -2,7 +2,14 @@ import logging
 import os
 import sys
 from dotenv import load_dotenv
-from pyrogram import Client
+from pyrogram import idle
+from database import db
+from jobs import jobs
+from leaderboard import leaderboard
+from process_pool import process_pool
+from log_sender import log_sender
+from scratch import scratch
+from rate_limiter import RateLimitedClient
 
 # Load environment variables
 load_dotenv()
@@ -19,14 +26,16 @@ API_ID = os.getenv("API_ID")
 API_HASH = os.getenv("API_HASH")
 BOT_TOKEN = os.getenv("BOT_TOKEN")
 DATABASE_URL = os.getenv("DATABASE_URL")
+DB_BACKEND = os.getenv("DB_BACKEND", "mongo")
 
-if not all([API_ID, API_HASH, BOT_TOKEN, DATABASE_URL]):
+# Only the MongoDB backend needs a database URL
+if not all([API_ID, API_HASH, BOT_TOKEN]) or (DB_BACKEND == "mongo" and not DATABASE_URL):
     logger.error("Missing required environment variables: API_ID, API_HASH, BOT_TOKEN, DATABASE_URL")
     sys.exit(1)
 
-# Initialize Pyrogram Client
+# Initialize Pyrogram Client, pacing all outbound API calls
 try:
-    app = Client(
+    app = RateLimitedClient(
         name="FileRenameBot",
         api_id=int(API_ID),
         api_hash=API_HASH,
@@ -54,11 +63,32 @@ except Exception as e:
     logger.error(f"Failed to import handlers: {e}")
     sys.exit(1)
 
+async def main():
+    """Connect to the database, run the bot until stopped, then clean up"""
+    if not await db.connect():
+        logger.error("Could not connect to the database, exiting")
+        return
+    
+    try:
+        scratch.cleanup()
+        leaderboard.start()
+        jobs.start()
+        await app.start()
+        logger.info("✅ Bot started")
+        await idle()
+        await app.stop()
+    finally:
+        jobs.stop()
+        log_sender.stop()
+        process_pool.stop()
+        leaderboard.stop()
+        await db.disconnect()
+
 # Main entry point
 if __name__ == "__main__":
     try:
         logger.info("🚀 Starting File Rename Bot...")
-        app.run()
+        app.run(main())
     except KeyboardInterrupt:
         logger.info("Bot stopped by user")
     except Exception as e:
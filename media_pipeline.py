@@ -0,0 +1,277 @@
+import asyncio
+import json
+import logging
+import os
+import shutil
+import time
+from config import (
+    FFMPEG_PATH, FFPROBE_PATH, FFMPEG_MAX_PROCESSES, AUTO_THUMBNAIL_OFFSET, AUTO_THUMBNAIL_HEAD_SIZE,
+    PROBE_HEAD_SIZE, PROBE_TAIL_SIZE
+)
+from scratch import scratch
+
+logger = logging.getLogger(__name__)
+
+GB = 1024 ** 3
+
+# stream_media yields 1 MB chunks
+CHUNK_SIZE = 1024 * 1024
+
+# Codecs each output container can hold with a stream copy (ffprobe names);
+# MKV takes anything
+CONTAINER_CODECS = {
+    "mkv": None,
+    "mp4": {
+        "video": {"h264", "hevc", "mpeg4", "av1", "vp9"},
+        "audio": {"aac", "mp3", "ac3", "eac3", "opus", "flac", "alac"}
+    },
+    "webm": {
+        "video": {"vp8", "vp9", "av1"},
+        "audio": {"opus", "vorbis"}
+    },
+    "avi": {
+        "video": {"h264", "mpeg4", "mjpeg", "msmpeg4v3"},
+        "audio": {"mp3", "ac3", "aac", "pcm_s16le"}
+    }
+}
+
+# filename_parser codec/audio tags as ffprobe codec names
+TAG_CODECS = {
+    "x264": "h264",
+    "H.264": "h264",
+    "AVC": "h264",
+    "x265": "hevc",
+    "H.265": "hevc",
+    "HEVC": "hevc",
+    "AAC": "aac",
+    "DDP": "eac3",
+    "AC3": "ac3",
+    "TrueHD": "truehd",
+    "DTS": "dts",
+    "DTS-HD": "dts",
+    "FLAC": "flac",
+    "Opus": "opus"
+}
+
+def can_stream_copy(container: str, video_codec=None, audio_codecs=()) -> bool:
+    """Whether known codecs fit a container without re-encoding; unknown ones are tried"""
+    allowed = CONTAINER_CODECS.get(container, {})
+    if allowed is None:
+        return True
+    if not allowed:
+        return False
+    if video_codec and video_codec not in allowed["video"]:
+        return False
+    return all(codec in allowed["audio"] for codec in audio_codecs)
+
+def get_metadata_tags(metadata: dict) -> dict:
+    """Container tags for a user's /metadata settings"""
+    metadata = metadata or {}
+    tags = {}
+    # /setmedia used to store "media_format_<type>" as the title
+    if metadata.get("title") and not metadata["title"].startswith("media_format_"):
+        tags["title"] = metadata["title"]
+    if metadata.get("author"):
+        tags["artist"] = metadata["author"]
+        tags["author"] = metadata["author"]
+    return tags
+
+class MediaPipeline:
+    """Download → ffmpeg remux → upload to rewrite a file's container or metadata
+
+    Files are streamed to disk chunk by chunk, so memory use doesn't grow
+    with file size. ffmpeg only copies the streams (-c copy) while
+    rewriting the container metadata, and at most max_processes ffmpeg
+    processes run at once. Each job runs its stages in order, and
+    concurrent jobs on the worker pool overlap one job's download with
+    another's remux or upload.
+    """
+    
+    def __init__(self, ffmpeg=FFMPEG_PATH, ffprobe=FFPROBE_PATH, max_processes=FFMPEG_MAX_PROCESSES):
+        self.ffmpeg = ffmpeg
+        self.ffprobe = ffprobe
+        self._processes = asyncio.Semaphore(max_processes)
+        self.downloaded_bytes = 0
+        self.remuxed = 0
+        self.remuxed_bytes = 0
+        self.remux_seconds = 0.0
+        self.failed = 0
+        self.frames = 0
+        self.probes = 0
+        self.probed_bytes = 0
+    
+    @property
+    def available(self):
+        """Whether the ffmpeg binary can be found"""
+        return shutil.which(self.ffmpeg) is not None
+    
+    @property
+    def probe_available(self):
+        """Whether the ffprobe binary can be found"""
+        return shutil.which(self.ffprobe) is not None
+    
+    def can_process(self, file_size, remux=True):
+        """Whether a file fits the scratch quota and, if it is to be remuxed, ffmpeg is available"""
+        return (self.available or not remux) and scratch.fits(self.get_reservation(file_size, remux))
+    
+    def get_reservation(self, file_size, remux=True):
+        """Scratch bytes a job needs: the download plus the remuxed copy, if any"""
+        return (2 if remux else 1) * file_size + 1024 * 1024
+    
+    async def download(self, app, file_id, path, chunks=0, offset=0):
+        """Stream a file, or chunks of it from offset on, to path and return the bytes written
+
+        Chunks are written at their place in the file, so a head and a tail
+        fetched separately make a sparse copy of the whole file.
+        """
+        size = 0
+        with open(path, "r+b" if offset else "wb") as f:
+            f.seek(offset * CHUNK_SIZE)
+            async for chunk in app.stream_media(file_id, limit=chunks, offset=offset):
+                f.write(chunk)
+                size += len(chunk)
+        self.downloaded_bytes += size
+        return size
+    
+    async def _run(self, binary, args):
+        """Run ffmpeg or ffprobe under the process cap, return its output and how long it ran
+
+        The process is killed if the caller is cancelled.
+        """
+        async with self._processes:
+            start = time.monotonic()
+            process = await asyncio.create_subprocess_exec(
+                binary,
+                *args,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE
+            )
+            try:
+                stdout, stderr = await process.communicate()
+            except asyncio.CancelledError:
+                process.kill()
+                await process.wait()
+                raise
+            if process.returncode != 0:
+                error = stderr.decode(errors="replace").strip().splitlines()
+                raise RuntimeError(f"{os.path.basename(binary)} exited with {process.returncode}: {error[-1] if error else 'no output'}")
+        return stdout, time.monotonic() - start
+    
+    async def remux(self, source, destination, metadata: dict, container=None):
+        """Copy the streams into a new container with the given metadata"""
+        args = ["-y", "-v", "error", "-i", source]
+        if container and container != "mkv":
+            # Subtitle and attachment streams rarely fit other containers
+            args += ["-map", "0:v", "-map", "0:a?"]
+        else:
+            args += ["-map", "0"]
+        args += ["-c", "copy"]
+        for key, value in metadata.items():
+            args += ["-metadata", f"{key}={value}"]
+        args.append(destination)
+        
+        _, elapsed = await self._run(self.ffmpeg, args)
+        size = os.path.getsize(source)
+        self.remuxed += 1
+        self.remuxed_bytes += size
+        self.remux_seconds += elapsed
+        logger.info(f"Remuxed {size / GB:.2f} GB in {elapsed:.1f}s ({elapsed / max(size / GB, 0.001):.1f} s/GB)")
+    
+    async def run(self, app, file_data: dict, metadata: dict, send, container=None):
+        """Download, remux and upload a file, return the result of send()
+
+        send(path, container) uploads the file; container is None when the
+        file kept its original container. With no metadata or container the
+        file is only re-uploaded, e.g. to give it a thumbnail. If ffmpeg
+        fails the downloaded file is sent unchanged.
+        """
+        _, ext = os.path.splitext(file_data["file_name"])
+        remux = bool(metadata or container)
+        
+        # Waits for scratch space if other jobs are using the quota
+        async with scratch.reserve(self.get_reservation(file_data["file_size"], remux)) as workdir:
+            source = os.path.join(workdir, f"source{ext}")
+            output = os.path.join(workdir, f"output.{container}" if container else f"output{ext}")
+            
+            await self.download(app, file_data["file_id"], source)
+            if not remux:
+                return await send(source, None)
+            try:
+                await self.remux(source, output, metadata, container)
+            except (OSError, RuntimeError) as e:
+                self.failed += 1
+                logger.error(f"Error remuxing {file_data['file_name']}, sending it unchanged: {e}")
+                return await send(source, None)
+            return await send(output, container)
+    
+    async def extract_frame(self, app, file_data: dict, offset=AUTO_THUMBNAIL_OFFSET, head_bytes=AUTO_THUMBNAIL_HEAD_SIZE):
+        """Grab a JPEG frame from a video's first head_bytes, None if there is none"""
+        _, ext = os.path.splitext(file_data["file_name"])
+        chunks = max(1, head_bytes // CHUNK_SIZE)
+        
+        async with scratch.reserve(chunks * CHUNK_SIZE + 1024 * 1024) as workdir:
+            head = os.path.join(workdir, f"head{ext}")
+            frame = os.path.join(workdir, "frame.jpg")
+            
+            await self.download(app, file_data["file_id"], head, chunks)
+            
+            # Fall back to the first frame when the head ends before the offset
+            for seek in dict.fromkeys((offset, 0)):
+                try:
+                    await self._run(self.ffmpeg, ["-y", "-v", "error", "-ss", str(seek), "-i", head, "-frames:v", "1", "-q:v", "2", frame])
+                except RuntimeError as e:
+                    # e.g. an MP4 whose moov atom isn't in the head
+                    logger.warning(f"No frame at {seek}s in the head of {file_data['file_name']}: {e}")
+                    continue
+                if os.path.exists(frame) and os.path.getsize(frame):
+                    self.frames += 1
+                    with open(frame, "rb") as f:
+                        return f.read()
+        return None
+    
+    async def probe(self, app, file_data: dict, head_bytes=PROBE_HEAD_SIZE, tail_bytes=PROBE_TAIL_SIZE):
+        """Run ffprobe on the start of a file and return its JSON report
+
+        Only the first head_bytes are fetched. If ffprobe can't read the
+        streams from them, as with MP4s whose moov atom is at the end, the
+        last tail_bytes are fetched too. The whole file is never downloaded.
+        """
+        _, ext = os.path.splitext(file_data["file_name"])
+        total_chunks = max(1, -(-file_data["file_size"] // CHUNK_SIZE))
+        head_chunks = min(max(1, head_bytes // CHUNK_SIZE), total_chunks)
+        tail_chunks = min(max(1, tail_bytes // CHUNK_SIZE), total_chunks - head_chunks)
+        args = ["-v", "error", "-print_format", "json", "-show_format", "-show_streams"]
+        
+        async with scratch.reserve((head_chunks + tail_chunks + 1) * CHUNK_SIZE) as workdir:
+            path = os.path.join(workdir, f"probe{ext}")
+            self.probed_bytes += await self.download(app, file_data["file_id"], path, head_chunks)
+            self.probes += 1
+            try:
+                stdout, _ = await self._run(self.ffprobe, args + [path])
+                report = json.loads(stdout or "{}")
+            except (RuntimeError, ValueError):
+                report = {}
+            
+            if not report.get("streams") and tail_chunks:
+                self.probed_bytes += await self.download(app, file_data["file_id"], path, tail_chunks, total_chunks - tail_chunks)
+                stdout, _ = await self._run(self.ffprobe, args + [path])
+                report = json.loads(stdout or "{}")
+        return report
+    
+    def stats(self):
+        """Get download and remux counters, including remux seconds per GB"""
+        remuxed_gb = self.remuxed_bytes / GB
+        return {
+            "downloaded_bytes": self.downloaded_bytes,
+            "remuxed": self.remuxed,
+            "remuxed_bytes": self.remuxed_bytes,
+            "remux_seconds": self.remux_seconds,
+            "seconds_per_gb": self.remux_seconds / remuxed_gb if remuxed_gb else 0.0,
+            "failed": self.failed,
+            "frames": self.frames,
+            "probes": self.probes,
+            "probed_bytes": self.probed_bytes
+        }
+
+# Initialize media pipeline instance
+media_pipeline = MediaPipeline()
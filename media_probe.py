@@ -0,0 +1,146 @@
+import asyncio
+import logging
+from config import PROBE_CACHE_SIZE
+from database import TTLCache
+from media_pipeline import media_pipeline
+from utils import format_seconds
+
+logger = logging.getLogger(__name__)
+
+# Placeholders a probe can fill in
+PROBE_FIELDS = frozenset(("quality", "codec", "audio", "language", "duration"))
+
+# A file's streams never change, so probe results are kept for a week
+PROBE_CACHE_TTL = 7 * 24 * 3600
+
+# Standard heights, largest first; a frame counts as one if it is close in width or height
+RESOLUTIONS = ((2160, 3840), (1440, 2560), (1080, 1920), (720, 1280), (576, 1024), (480, 854), (360, 640))
+
+# ffprobe codec names as filename_parser tags
+VIDEO_TAGS = {
+    "h264": "H.264",
+    "hevc": "HEVC",
+    "av1": "AV1",
+    "vp9": "VP9",
+    "mpeg4": "MPEG-4"
+}
+
+AUDIO_TAGS = {
+    "eac3": "DDP",
+    "ac3": "AC3",
+    "aac": "AAC",
+    "truehd": "TrueHD",
+    "dts": "DTS",
+    "flac": "FLAC",
+    "opus": "Opus",
+    "mp3": "MP3",
+    "vorbis": "Vorbis"
+}
+
+CHANNEL_LAYOUTS = {1: "1.0", 2: "2.0", 6: "5.1", 8: "7.1"}
+
+def get_quality(width: int, height: int) -> str:
+    """Quality tag such as 1080p for a frame size, so 1920x800 is still 1080p"""
+    for standard_height, standard_width in RESOLUTIONS:
+        if height >= standard_height * 0.9 or width >= standard_width * 0.9:
+            return f"{standard_height}p"
+    return f"{height}p" if height else ""
+
+def get_audio_tag(stream: dict) -> str:
+    """Audio tag such as DDP5.1 Atmos for an ffprobe audio stream"""
+    profile = stream.get("profile") or ""
+    tag = AUDIO_TAGS.get(stream.get("codec_name"), (stream.get("codec_name") or "").upper())
+    if tag == "DTS" and "HD" in profile:
+        tag = "DTS-HD"
+    tag += CHANNEL_LAYOUTS.get(stream.get("channels"), "")
+    if "Atmos" in profile:
+        tag += " Atmos"
+    return tag
+
+def get_probe_info(report: dict) -> dict:
+    """Placeholder values and codec names from an ffprobe JSON report"""
+    streams = report.get("streams") or []
+    video = next((stream for stream in streams if stream.get("codec_type") == "video"
+                  and not stream.get("disposition", {}).get("attached_pic")), None)
+    audio = [stream for stream in streams if stream.get("codec_type") == "audio"]
+    # The default track names the audio; fall back to the first one
+    main_audio = next((stream for stream in audio if stream.get("disposition", {}).get("default")), audio[0] if audio else None)
+    
+    languages = []
+    for stream in audio:
+        language = (stream.get("tags") or {}).get("language", "")
+        if language and language != "und" and language not in languages:
+            languages.append(language)
+    
+    try:
+        duration = float(report.get("format", {}).get("duration") or (video or {}).get("duration") or 0)
+    except ValueError:
+        duration = 0
+    
+    return {
+        "quality": get_quality(video.get("width") or 0, video.get("height") or 0) if video else "",
+        "codec": VIDEO_TAGS.get(video["codec_name"], video["codec_name"].upper()) if video and video.get("codec_name") else "",
+        "audio": get_audio_tag(main_audio) if main_audio else "",
+        "language": "+".join(languages),
+        "duration": format_seconds(round(duration)) if duration else "",
+        "video_codec": video.get("codec_name") if video else None,
+        "audio_codecs": [stream["codec_name"] for stream in audio if stream.get("codec_name")]
+    }
+
+class MediaProbe:
+    """What a file's own headers say about it, keyed by file_unique_id
+
+    Each file is probed once with ffprobe on its first few MB (and its
+    last few when that is where the index is), and the result is reused
+    for every later rename. Files that can't be probed are remembered
+    as empty results, so they aren't fetched again.
+    """
+    
+    def __init__(self, max_size=PROBE_CACHE_SIZE, ttl=PROBE_CACHE_TTL):
+        self.cache = TTLCache(max_size, ttl)
+        self.failed = 0
+        self._locks = {}
+    
+    async def get(self, app, file_data: dict) -> dict:
+        """Get probe info for a file, {} if its headers couldn't be read"""
+        file_unique_id = file_data.get("file_unique_id")
+        if not file_unique_id:
+            return {}
+        
+        info = self.cache.get(file_unique_id)
+        if info is not None:
+            return info
+        
+        # One probe per file even when several renames ask at once
+        lock = self._locks.setdefault(file_unique_id, asyncio.Lock())
+        try:
+            async with lock:
+                info = self.cache.get(file_unique_id)
+                if info is None:
+                    # The probe only adds detail, so any failure falls back to the file name
+                    try:
+                        info = get_probe_info(await media_pipeline.probe(app, file_data))
+                    except (OSError, RuntimeError, ValueError) as e:
+                        # ffprobe can't read this file; don't fetch it again
+                        self.failed += 1
+                        logger.error(f"Error probing {file_data['file_name']}: {e}")
+                        info = {}
+                    except Exception as e:
+                        # e.g. FloodWait or an expired file reference; worth retrying next time
+                        self.failed += 1
+                        logger.error(f"Error fetching {file_data['file_name']} to probe it: {e}")
+                        return {}
+                    self.cache.set(file_unique_id, info)
+                return info
+        finally:
+            self._locks.pop(file_unique_id, None)
+    
+    def stats(self):
+        """Get cache counters and failed probes"""
+        return {
+            **self.cache.stats(),
+            "failed": self.failed
+        }
+
+# Initialize media probe instance
+media_probe = MediaProbe()
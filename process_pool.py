@@ -0,0 +1,60 @@
+import asyncio
+import logging
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from config import PROCESS_POOL_MAX_WORKERS, PROCESS_POOL_QUEUE_SIZE
+
+logger = logging.getLogger(__name__)
+
+def get_cpu_limit() -> int:
+    """CPUs this process may use: cgroup quota, affinity and core count"""
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count() or 1
+    # A container quota such as Koyeb's 250m is "25000 100000" in cpu.max
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            cpus = min(cpus, math.ceil(int(quota) / int(period)))
+    except (OSError, ValueError):
+        pass
+    return max(1, cpus)
+
+class ProcessPool:
+    """Process pool for CPU-bound work such as image decoding and encoding
+
+    Work runs in worker processes so it never stalls the event loop. At
+    most workers + queue_size calls are submitted at once; further
+    callers wait for a slot. Cancelling a waiting caller drops its work
+    if no worker has picked it up yet.
+    """
+    
+    def __init__(self, max_workers=PROCESS_POOL_MAX_WORKERS, queue_size=PROCESS_POOL_QUEUE_SIZE):
+        self.workers = max(1, min(get_cpu_limit(), max_workers))
+        self.queue_size = queue_size
+        self._slots = asyncio.Semaphore(self.workers + queue_size)
+        self._executor = None
+        self.submitted = 0
+        self.cancelled = 0
+    
+    async def run(self, func, *args):
+        """Run func(*args) in a worker process and return its result"""
+        async with self._slots:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            self.submitted += 1
+            try:
+                # Cancelling this await also cancels the pool's future if it hasn't started
+                return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+            except asyncio.CancelledError:
+                self.cancelled += 1
+                raise
+    
+    def stop(self):
+        """Shut the workers down, dropping queued work"""
+        if self._executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+# Initialize process pool instance
+process_pool = ProcessPool()
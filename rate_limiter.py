@@ -0,0 +1,160 @@
+import asyncio
+import logging
+import random
+import time
+from collections import Counter, OrderedDict
+from pyrogram import Client, raw
+from pyrogram.errors import FloodWait
+from config import (
+    LOG_CHANNEL, RATE_LIMIT_GLOBAL_RATE, RATE_LIMIT_CHAT_RATE, RATE_LIMIT_CHAT_BURST,
+    RATE_LIMIT_LOG_RATE, RATE_LIMIT_MAX_RETRIES, RATE_LIMIT_MAX_CHATS
+)
+
+logger = logging.getLogger(__name__)
+
+# Requests that post or change messages in a chat and count against Telegram's limits
+PACED_QUERIES = (
+    raw.functions.messages.SendMessage,
+    raw.functions.messages.SendMedia,
+    raw.functions.messages.SendMultiMedia,
+    raw.functions.messages.EditMessage,
+    raw.functions.messages.ForwardMessages,
+    raw.functions.messages.DeleteMessages,
+    raw.functions.channels.DeleteMessages
+)
+
+class TokenBucket:
+    """Token bucket that hands out send times instead of blocking"""
+    
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+    
+    def reserve(self):
+        """Take a token and return how long to wait before using it"""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        # Tokens may go negative: later callers queue up behind earlier ones
+        self.tokens -= 1
+        wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        return max(wait, self.blocked_until - now)
+    
+    def block(self, seconds):
+        """Hold back every caller for seconds, e.g. after a FloodWait"""
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+class RateLimiter:
+    """Paces outbound messages with a global, per-chat and log channel budget
+
+    Every paced request takes a token from the global bucket and from
+    its chat's bucket; LOG_CHANNEL has its own smaller budget so logging
+    never eats into user traffic. FloodWait errors block the affected
+    bucket and the request is retried with jitter.
+    """
+    
+    def __init__(
+        self,
+        global_rate=RATE_LIMIT_GLOBAL_RATE,
+        chat_rate=RATE_LIMIT_CHAT_RATE,
+        chat_burst=RATE_LIMIT_CHAT_BURST,
+        log_rate=RATE_LIMIT_LOG_RATE,
+        max_retries=RATE_LIMIT_MAX_RETRIES,
+        max_chats=RATE_LIMIT_MAX_CHATS
+    ):
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.log_bucket = TokenBucket(log_rate, 1)
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.max_retries = max_retries
+        self.max_chats = max_chats
+        self.chat_buckets = OrderedDict()
+        self.counters = Counter()
+    
+    def _chat_bucket(self, chat_id):
+        if chat_id == LOG_CHANNEL:
+            return self.log_bucket
+        bucket = self.chat_buckets.get(chat_id)
+        if bucket is None:
+            bucket = self.chat_buckets[chat_id] = TokenBucket(self.chat_rate, self.chat_burst)
+            # Forget the least recently used chats
+            if len(self.chat_buckets) > self.max_chats:
+                self.chat_buckets.popitem(last=False)
+        else:
+            self.chat_buckets.move_to_end(chat_id)
+        return bucket
+    
+    async def acquire(self, chat_id=None):
+        """Wait until a message may be sent, to chat_id if it is known"""
+        wait = self.global_bucket.reserve()
+        if chat_id is not None:
+            wait = max(wait, self._chat_bucket(chat_id).reserve())
+        if wait > 0:
+            self.counters["throttled"] += 1
+            await asyncio.sleep(wait)
+    
+    async def call(self, func, chat_id=None, paced=True):
+        """Run func() under the limits, retrying on FloodWait"""
+        self.counters["calls"] += 1
+        for attempt in range(self.max_retries + 1):
+            if paced:
+                await self.acquire(chat_id)
+            try:
+                return await func()
+            except FloodWait as e:
+                self.counters["flood_waits"] += 1
+                if attempt == self.max_retries:
+                    self.counters["failed"] += 1
+                    raise
+                
+                # Hold back this chat's other messages too, and everything if it was global
+                delay = e.value + random.uniform(0.5, 1.5)
+                if chat_id is not None:
+                    self._chat_bucket(chat_id).block(delay)
+                else:
+                    self.global_bucket.block(delay)
+                logger.warning(f"FloodWait of {e.value}s for chat {chat_id}, retrying in {delay:.1f}s")
+                self.counters["retried"] += 1
+                await asyncio.sleep(delay)
+    
+    def get_stats(self):
+        """Get call, throttle and FloodWait counters"""
+        return {
+            "calls": self.counters["calls"],
+            "throttled": self.counters["throttled"],
+            "flood_waits": self.counters["flood_waits"],
+            "retried": self.counters["retried"],
+            "failed": self.counters["failed"],
+            "chats": len(self.chat_buckets)
+        }
+
+def get_chat_id(peer):
+    """Bot API style chat ID of a raw input peer, None if unknown"""
+    if isinstance(peer, raw.types.InputPeerUser):
+        return peer.user_id
+    if isinstance(peer, raw.types.InputPeerChat):
+        return -peer.chat_id
+    if isinstance(peer, (raw.types.InputPeerChannel, raw.types.InputChannel)):
+        return -1000000000000 - peer.channel_id
+    return None
+
+class RateLimitedClient(Client):
+    """Client whose API calls all go through the outbound rate limiter"""
+    
+    async def invoke(self, query, *args, **kwargs):
+        chat_id = None
+        paced = isinstance(query, PACED_QUERIES)
+        if paced:
+            peer = getattr(query, "peer", None) or getattr(query, "to_peer", None) or getattr(query, "channel", None)
+            chat_id = get_chat_id(peer)
+        return await limiter.call(
+            lambda: super(RateLimitedClient, self).invoke(query, *args, **kwargs),
+            chat_id,
+            paced
+        )
+
+# Initialize rate limiter instance
+limiter = RateLimiter()
@@ -0,0 +1,47 @@
+import re
+from functools import lru_cache
+from config import TEMPLATE_CACHE_SIZE
+
+PLACEHOLDERS = ("season", "episode", "title", "quality", "codec", "audio", "language", "duration")
+PLACEHOLDER_RE = re.compile(r"\{(\w+)\}")
+
+class RenameTemplate:
+    """A rename format split once into literal text and placeholders"""
+    
+    def __init__(self, format_string: str):
+        self.format_string = format_string
+        self.unknown = []
+        # Alternating literal/field parts; unknown placeholders stay literal text
+        parts = []
+        literal = ""
+        position = 0
+        for match in PLACEHOLDER_RE.finditer(format_string):
+            literal += format_string[position:match.start()]
+            name = match.group(1)
+            if name in PLACEHOLDERS:
+                parts.append((literal, name))
+                literal = ""
+            else:
+                literal += match.group(0)
+                if name not in self.unknown:
+                    self.unknown.append(name)
+            position = match.end()
+        self._parts = tuple(parts)
+        self.fields = frozenset(name for _, name in parts)
+        self._tail = literal + format_string[position:]
+    
+    def render(self, values: dict) -> str:
+        """Fill the placeholders from values in a single pass"""
+        return "".join([
+            literal + str(values.get(name, ""))
+            for literal, name in self._parts
+        ]) + self._tail
+
+@lru_cache(maxsize=TEMPLATE_CACHE_SIZE)
+def compile_format(format_string: str) -> RenameTemplate:
+    """Get the compiled template of a rename format"""
+    return RenameTemplate(format_string)
+
+def get_template_cache_info():
+    """Get hit/miss counts of the compiled template cache"""
+    return compile_format.cache_info()
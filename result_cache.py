@@ -0,0 +1,27 @@
+from config import RESULT_CACHE_SIZE, RESULT_CACHE_TTL
+from database import TTLCache
+
+# Profile fields that change the renamed output
+SETTINGS_FIELDS = ("rename_format", "prefix", "suffix", "caption", "media_format")
+
+def get_settings_version(profile: dict) -> int:
+    """Version of a user's rename settings, changing whenever they do"""
+    thumbnail = profile.get("thumbnail") or {}
+    metadata = profile.get("metadata") or {}
+    return hash((
+        tuple(profile.get(field) for field in SETTINGS_FIELDS),
+        thumbnail.get("file_unique_id"),
+        metadata.get("title"),
+        metadata.get("author")
+    ))
+
+def get_result_key(file_data: dict, profile: dict):
+    """Result cache key of a file for these settings, None if it can't be cached"""
+    file_unique_id = file_data.get("file_unique_id")
+    if not file_unique_id:
+        return None
+    return (file_unique_id, get_settings_version(profile))
+
+# Renamed file_id, name and caption of files already processed, keyed by
+# (file_unique_id, settings version) so resent files skip straight to sending
+result_cache = TTLCache(max_size=RESULT_CACHE_SIZE, ttl=RESULT_CACHE_TTL)
@@ -0,0 +1,88 @@
+import asyncio
+import logging
+import os
+import shutil
+import uuid
+from contextlib import asynccontextmanager
+from config import DOWNLOAD_DIR, SCRATCH_QUOTA, SCRATCH_TMPFS_DIR, SCRATCH_TMPFS_QUOTA
+
+logger = logging.getLogger(__name__)
+
+class ScratchPool:
+    """A scratch directory and the bytes reserved in it"""
+    
+    def __init__(self, directory, quota):
+        self.directory = directory
+        self.quota = quota
+        self.used = 0
+    
+    def has_room(self, size):
+        return self.used + size <= self.quota
+
+class ScratchSpace:
+    """Per-job work directories within a byte quota
+
+    Jobs reserve the space they will need before downloading anything
+    and get a private directory that is removed when the job ends,
+    whether it succeeds, fails or is cancelled. When the quota is used
+    up, jobs wait for space instead of filling the disk. An optional
+    tmpfs directory with its own quota is used first when a job fits.
+    """
+    
+    def __init__(self, directory=DOWNLOAD_DIR, quota=SCRATCH_QUOTA, tmpfs_dir=SCRATCH_TMPFS_DIR, tmpfs_quota=SCRATCH_TMPFS_QUOTA):
+        self.pools = []
+        if tmpfs_dir and tmpfs_quota:
+            self.pools.append(ScratchPool(tmpfs_dir, tmpfs_quota))
+        self.pools.append(ScratchPool(directory, quota))
+        self.waiting = 0
+        self._condition = asyncio.Condition()
+    
+    def fits(self, size):
+        """Whether a job of size bytes can ever get a reservation"""
+        return any(size <= pool.quota for pool in self.pools)
+    
+    def _find_pool(self, size):
+        return next((pool for pool in self.pools if pool.has_room(size)), None)
+    
+    def cleanup(self):
+        """Remove work directories left behind by a previous run"""
+        for pool in self.pools:
+            if os.path.isdir(pool.directory):
+                for entry in os.scandir(pool.directory):
+                    if entry.is_dir() and entry.name.startswith("job-"):
+                        shutil.rmtree(entry.path, ignore_errors=True)
+    
+    @asynccontextmanager
+    async def reserve(self, size):
+        """Reserve size bytes and yield a private work directory for a job"""
+        if not self.fits(size):
+            raise ValueError(f"File needs {size} bytes of scratch space, more than the quota")
+        
+        async with self._condition:
+            self.waiting += 1
+            try:
+                pool = await self._condition.wait_for(lambda: self._find_pool(size))
+            finally:
+                self.waiting -= 1
+            pool.used += size
+        
+        workdir = os.path.join(pool.directory, f"job-{uuid.uuid4().hex}")
+        try:
+            os.makedirs(workdir)
+            yield workdir
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+            pool.used -= size
+            async with self._condition:
+                self._condition.notify_all()
+    
+    def stats(self):
+        """Get reserved bytes, quota and number of jobs waiting for space"""
+        return {
+            "used": sum(pool.used for pool in self.pools),
+            "quota": sum(pool.quota for pool in self.pools),
+            "waiting": self.waiting
+        }
+
+# Initialize scratch space instance
+scratch = ScratchSpace()
@@ -0,0 +1,31 @@
+"""
+Storage backends for the bot's database layer
+"""
+
+import os
+from .base import StorageBackend
+
+BACKENDS = ["mongo", "sqlite", "memory"]
+
+def create_backend(name=None):
+    """Create the storage backend selected by name or DB_BACKEND"""
+    name = name or os.getenv("DB_BACKEND", "mongo")
+    
+    # Backends are imported lazily so e.g. SQLite installs don't need motor
+    if name == "mongo":
+        from .mongo import MongoBackend
+        return MongoBackend(os.getenv("DB_URL"), os.getenv("DATABASE_NAME", "file_rename_bot"))
+    if name == "sqlite":
+        from .sqlite import SQLiteBackend
+        return SQLiteBackend(os.getenv("SQLITE_PATH", "file_rename_bot.db"))
+    if name == "memory":
+        from .memory import MemoryBackend
+        return MemoryBackend()
+    
+    raise ValueError(f"Unknown storage backend: {name} (expected one of {', '.join(BACKENDS)})")
+
+__all__ = [
+    "BACKENDS",
+    "StorageBackend",
+    "create_backend"
+]
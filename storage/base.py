@@ -0,0 +1,202 @@
+from abc import ABC, abstractmethod
+
+# Sequence files read per query, so no cursor stays open while files are sent
+SEQUENCE_BATCH_SIZE = 100
+
+class StorageBackend(ABC):
+    """Persistence operations the bot needs from a storage engine
+
+    Documents are plain dicts keyed like the MongoDB collections
+    (user_id, rename_count, is_banned, ...). Caching, the in-memory ban
+    and admin sets and counter buffering live in database.Database on
+    top of a backend, so backends only implement storage.
+    """
+    
+    name = "base"
+    
+    @abstractmethod
+    async def connect(self):
+        """Open the backend and prepare its schema/indexes, return success"""
+    
+    @abstractmethod
+    async def disconnect(self):
+        """Close the backend"""
+    
+    # User operations
+    @abstractmethod
+    async def add_user(self, user_id, username=None, first_name=None):
+        """Add or update user"""
+    
+    @abstractmethod
+    async def get_user(self, user_id):
+        """Get user data"""
+    
+    @abstractmethod
+    async def add_rename_counts(self, counts):
+        """Add (user_id, count) increments to rename counts in one batch
+
+        Returns the increments that could not be written.
+        """
+    
+    @abstractmethod
+    async def get_user_profile(self, user_id):
+        """Get ban flag and all rename settings of a user in one read"""
+    
+    # Thumbnail operations
+    @abstractmethod
+    async def set_thumbnail(self, user_id, file_id, file_unique_id):
+        """Set user's thumbnail"""
+    
+    @abstractmethod
+    async def get_thumbnail(self, user_id):
+        """Get user's thumbnail"""
+    
+    @abstractmethod
+    async def delete_thumbnail(self, user_id):
+        """Delete user's thumbnail"""
+    
+    # Caption operations
+    @abstractmethod
+    async def set_caption(self, user_id, caption):
+        """Set user's custom caption"""
+    
+    @abstractmethod
+    async def get_caption(self, user_id):
+        """Get user's custom caption"""
+    
+    @abstractmethod
+    async def delete_caption(self, user_id):
+        """Delete user's custom caption"""
+    
+    # Rename format operations
+    @abstractmethod
+    async def set_rename_format(self, user_id, format_string):
+        """Set user's rename format"""
+    
+    @abstractmethod
+    async def get_rename_format(self, user_id):
+        """Get user's rename format"""
+    
+    # Prefix/Suffix operations
+    @abstractmethod
+    async def set_prefix(self, user_id, prefix):
+        """Set user's prefix"""
+    
+    @abstractmethod
+    async def get_prefix(self, user_id):
+        """Get user's prefix"""
+    
+    @abstractmethod
+    async def set_suffix(self, user_id, suffix):
+        """Set user's suffix"""
+    
+    @abstractmethod
+    async def get_suffix(self, user_id):
+        """Get user's suffix"""
+    
+    @abstractmethod
+    async def delete_prefix(self, user_id):
+        """Delete user's prefix"""
+    
+    @abstractmethod
+    async def delete_suffix(self, user_id):
+        """Delete user's suffix"""
+    
+    # Metadata operations
+    @abstractmethod
+    async def set_metadata(self, user_id, title=None, author=None):
+        """Set the given metadata fields, leaving the others unchanged"""
+    
+    @abstractmethod
+    async def get_metadata(self, user_id):
+        """Get user's metadata"""
+    
+    @abstractmethod
+    async def delete_metadata(self, user_id):
+        """Delete user's metadata"""
+    
+    # Media format operations
+    @abstractmethod
+    async def set_media_format(self, user_id, media_format):
+        """Set user's output container, e.g. mp4 or mkv"""
+    
+    @abstractmethod
+    async def get_media_format(self, user_id):
+        """Get user's output container"""
+    
+    # Force subscribe channels
+    @abstractmethod
+    async def add_force_sub_channel(self, channel_username):
+        """Add channel to force subscribe list"""
+    
+    @abstractmethod
+    async def remove_force_sub_channel(self, channel_username):
+        """Remove channel from force subscribe list"""
+    
+    @abstractmethod
+    async def get_all_force_sub_channels(self):
+        """Get all force subscribe channels"""
+    
+    # Ban operations
+    @abstractmethod
+    async def set_banned(self, user_id, banned, updated_at):
+        """Set user's ban flag, creating the user if needed when banning"""
+    
+    @abstractmethod
+    async def get_banned_user_ids(self):
+        """Get IDs of all banned users"""
+    
+    @abstractmethod
+    async def get_ban_changes(self, since):
+        """Get user_id/is_banned of users whose ban flag changed since a time"""
+    
+    @abstractmethod
+    async def get_banned_users(self):
+        """Get all banned users"""
+    
+    # Admin operations
+    @abstractmethod
+    async def add_admin(self, user_id, added_at):
+        """Add an admin"""
+    
+    @abstractmethod
+    async def remove_admin(self, user_id):
+        """Remove an admin"""
+    
+    @abstractmethod
+    async def get_all_admins(self):
+        """Get all admins"""
+    
+    # Leaderboard operations
+    @abstractmethod
+    async def get_leaderboard(self, limit=10):
+        """Get top users by rename count"""
+    
+    @abstractmethod
+    async def get_user_rank(self, user_id):
+        """Get user's leaderboard position and rename count"""
+    
+    # Sequence mode operations
+    @abstractmethod
+    async def start_sequence(self, user_id):
+        """Start a new sequence for user, dropping the files of one that was never ended"""
+    
+    @abstractmethod
+    async def add_to_sequence(self, user_id, file_data):
+        """Append a file to the active sequence, return its position or None"""
+    
+    @abstractmethod
+    async def end_sequence(self, user_id):
+        """End the active sequence, return its id and file count or (None, 0)"""
+    
+    @abstractmethod
+    def iter_sequence(self, user_id, sequence_id):
+        """Async iterator over an ended sequence's files in the order they were added"""
+    
+    @abstractmethod
+    async def clear_sequence(self, user_id, sequence_id):
+        """Delete an ended sequence's files"""
+    
+    @abstractmethod
+    async def is_sequence_active(self, user_id):
+        """Check if user has active sequence mode"""
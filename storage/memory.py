@@ -0,0 +1,278 @@
+import copy
+from collections import defaultdict
+from datetime import datetime
+from .base import StorageBackend
+
+class MemoryBackend(StorageBackend):
+    """Non-persistent storage in plain dicts, for tests and benchmarks"""
+    
+    name = "memory"
+    
+    def __init__(self):
+        # collection name -> {key: document}
+        self.collections = defaultdict(dict)
+        # (user_id, sequence_id) -> files of the sequence, in order
+        self.sequence_files = defaultdict(list)
+    
+    async def connect(self):
+        """Nothing to open"""
+        return True
+    
+    async def disconnect(self):
+        """Nothing to close"""
+    
+    def _find(self, collection, key):
+        document = self.collections[collection].get(key)
+        return copy.deepcopy(document) if document else None
+    
+    def _update(self, collection, key, fields, upsert=True):
+        documents = self.collections[collection]
+        if key not in documents:
+            if not upsert:
+                return None
+            documents[key] = {"user_id": key}
+        documents[key].update(fields)
+        return documents[key]
+    
+    # User operations
+    async def add_user(self, user_id, username=None, first_name=None):
+        """Add or update user"""
+        user = self._update("users", user_id, {
+            "username": username,
+            "first_name": first_name,
+            "joined_date": datetime.now()
+        })
+        user.setdefault("rename_count", 0)
+        user.setdefault("is_banned", False)
+    
+    async def get_user(self, user_id):
+        """Get user data"""
+        return self._find("users", user_id)
+    
+    async def add_rename_counts(self, counts):
+        """Add rename count increments"""
+        for user_id, count in counts:
+            user = self._update("users", user_id, {})
+            user["rename_count"] = user.get("rename_count", 0) + count
+            user.setdefault("is_banned", False)
+        return []
+    
+    async def get_user_profile(self, user_id):
+        """Get ban flag and all rename settings of a user"""
+        user = self._find("users", user_id) or {}
+        affixes = self._find("affixes", user_id) or {}
+        return {
+            "user_id": user_id,
+            "is_banned": user.get("is_banned", False),
+            "rename_format": await self.get_rename_format(user_id),
+            "prefix": affixes.get("prefix"),
+            "suffix": affixes.get("suffix"),
+            "caption": await self.get_caption(user_id),
+            "thumbnail": self._find("thumbnails", user_id),
+            "metadata": self._find("metadata", user_id),
+            "media_format": await self.get_media_format(user_id),
+            "sequence_active": await self.is_sequence_active(user_id)
+        }
+    
+    # Thumbnail operations
+    async def set_thumbnail(self, user_id, file_id, file_unique_id):
+        """Set user's thumbnail"""
+        self._update("thumbnails", user_id, {
+            "file_id": file_id,
+            "file_unique_id": file_unique_id,
+            "updated_at": datetime.now()
+        })
+    
+    async def get_thumbnail(self, user_id):
+        """Get user's thumbnail"""
+        return self._find("thumbnails", user_id)
+    
+    async def delete_thumbnail(self, user_id):
+        """Delete user's thumbnail"""
+        self.collections["thumbnails"].pop(user_id, None)
+    
+    # Caption operations
+    async def set_caption(self, user_id, caption):
+        """Set user's custom caption"""
+        self._update("captions", user_id, {"caption": caption, "updated_at": datetime.now()})
+    
+    async def get_caption(self, user_id):
+        """Get user's custom caption"""
+        result = self._find("captions", user_id)
+        return result["caption"] if result else None
+    
+    async def delete_caption(self, user_id):
+        """Delete user's custom caption"""
+        self.collections["captions"].pop(user_id, None)
+    
+    # Rename format operations
+    async def set_rename_format(self, user_id, format_string):
+        """Set user's rename format"""
+        self._update("rename_formats", user_id, {"format": format_string, "updated_at": datetime.now()})
+    
+    async def get_rename_format(self, user_id):
+        """Get user's rename format"""
+        result = self._find("rename_formats", user_id)
+        return result["format"] if result else None
+    
+    # Prefix/Suffix operations
+    async def set_prefix(self, user_id, prefix):
+        """Set user's prefix"""
+        self._update("affixes", user_id, {"prefix": prefix})
+    
+    async def get_prefix(self, user_id):
+        """Get user's prefix"""
+        result = self._find("affixes", user_id)
+        return result.get("prefix") if result else None
+    
+    async def set_suffix(self, user_id, suffix):
+        """Set user's suffix"""
+        self._update("affixes", user_id, {"suffix": suffix})
+    
+    async def get_suffix(self, user_id):
+        """Get user's suffix"""
+        result = self._find("affixes", user_id)
+        return result.get("suffix") if result else None
+    
+    async def delete_prefix(self, user_id):
+        """Delete user's prefix"""
+        self.collections["affixes"].get(user_id, {}).pop("prefix", None)
+    
+    async def delete_suffix(self, user_id):
+        """Delete user's suffix"""
+        self.collections["affixes"].get(user_id, {}).pop("suffix", None)
+    
+    # Metadata operations
+    async def set_metadata(self, user_id, title=None, author=None):
+        """Set user's metadata"""
+        update_data = {"updated_at": datetime.now()}
+        if title:
+            update_data["title"] = title
+        if author:
+            update_data["author"] = author
+        self._update("metadata", user_id, update_data)
+    
+    async def get_metadata(self, user_id):
+        """Get user's metadata"""
+        return self._find("metadata", user_id)
+    
+    async def delete_metadata(self, user_id):
+        """Delete user's metadata"""
+        self.collections["metadata"].pop(user_id, None)
+    
+    # Media format operations
+    async def set_media_format(self, user_id, media_format):
+        """Set user's output container, e.g. mp4 or mkv"""
+        self._update("media_formats", user_id, {"format": media_format, "updated_at": datetime.now()})
+    
+    async def get_media_format(self, user_id):
+        """Get user's output container"""
+        result = self._find("media_formats", user_id)
+        return result["format"] if result else None
+    
+    # Force subscribe channels
+    async def add_force_sub_channel(self, channel_username):
+        """Add channel to force subscribe list"""
+        self.collections["force_sub_channels"][channel_username] = {"username": channel_username}
+    
+    async def remove_force_sub_channel(self, channel_username):
+        """Remove channel from force subscribe list"""
+        self.collections["force_sub_channels"].pop(channel_username, None)
+    
+    async def get_all_force_sub_channels(self):
+        """Get all force subscribe channels"""
+        return [dict(channel) for channel in self.collections["force_sub_channels"].values()]
+    
+    # Ban operations
+    async def set_banned(self, user_id, banned, updated_at):
+        """Set user's ban flag"""
+        self._update("users", user_id, {"is_banned": banned, "ban_updated_at": updated_at}, upsert=banned)
+    
+    async def get_banned_user_ids(self):
+        """Get IDs of all banned users"""
+        return [user_id for user_id, user in self.collections["users"].items() if user.get("is_banned")]
+    
+    async def get_ban_changes(self, since):
+        """Get users whose ban flag changed since a time"""
+        return [
+            {"user_id": user_id, "is_banned": user.get("is_banned", False)}
+            for user_id, user in self.collections["users"].items()
+            if user.get("ban_updated_at") and user["ban_updated_at"] >= since
+        ]
+    
+    async def get_banned_users(self):
+        """Get all banned users"""
+        return [copy.deepcopy(user) for user in self.collections["users"].values() if user.get("is_banned")]
+    
+    # Admin operations
+    async def add_admin(self, user_id, added_at):
+        """Add an admin"""
+        self._update("admins", user_id, {"added_at": added_at})
+    
+    async def remove_admin(self, user_id):
+        """Remove an admin"""
+        self.collections["admins"].pop(user_id, None)
+    
+    async def get_all_admins(self):
+        """Get all admins"""
+        return [dict(admin) for admin in self.collections["admins"].values()]
+    
+    # Leaderboard operations
+    async def get_leaderboard(self, limit=10):
+        """Get top users by rename count"""
+        users = sorted(self.collections["users"].values(), key=lambda user: user.get("rename_count", 0), reverse=True)
+        return [copy.deepcopy(user) for user in users[:limit]]
+    
+    async def get_user_rank(self, user_id):
+        """Get user's leaderboard position and rename count"""
+        user = self.collections["users"].get(user_id)
+        if not user:
+            return None
+        
+        rename_count = user.get("rename_count", 0)
+        higher = sum(1 for other in self.collections["users"].values() if other.get("rename_count", 0) > rename_count)
+        return {"rank": higher + 1, "rename_count": rename_count}
+    
+    # Sequence mode operations
+    async def start_sequence(self, user_id):
+        """Start file sequence mode for user"""
+        sequence = self.collections["sequences"].get(user_id) or {}
+        if sequence.get("is_active"):
+            self.sequence_files.pop((user_id, sequence["sequence_id"]), None)
+        self._update("sequences", user_id, {
+            "sequence_id": sequence.get("sequence_id", 0) + 1,
+            "is_active": True,
+            "started_at": datetime.now()
+        })
+    
+    async def add_to_sequence(self, user_id, file_data):
+        """Add file to sequence"""
+        sequence = self.collections["sequences"].get(user_id)
+        if not sequence or not sequence.get("is_active"):
+            return None
+        files = self.sequence_files[(user_id, sequence["sequence_id"])]
+        files.append(copy.deepcopy(file_data))
+        return len(files)
+    
+    async def end_sequence(self, user_id):
+        """End file sequence mode for user"""
+        sequence = self.collections["sequences"].get(user_id)
+        if not sequence or not sequence.get("is_active"):
+            return None, 0
+        sequence["is_active"] = False
+        sequence_id = sequence["sequence_id"]
+        return sequence_id, len(self.sequence_files.get((user_id, sequence_id), []))
+    
+    async def iter_sequence(self, user_id, sequence_id):
+        """Iterate the sequence's files in order"""
+        for file_data in list(self.sequence_files.get((user_id, sequence_id), [])):
+            yield copy.deepcopy(file_data)
+    
+    async def clear_sequence(self, user_id, sequence_id):
+        """Delete the sequence's files"""
+        self.sequence_files.pop((user_id, sequence_id), None)
+    
+    async def is_sequence_active(self, user_id):
+        """Check if user has active sequence mode"""
+        sequence = self.collections["sequences"].get(user_id)
+        return sequence.get("is_active", False) if sequence else False
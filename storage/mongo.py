@@ -0,0 +1,489 @@
+import logging
+from datetime import datetime
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, DESCENDING, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, ConnectionFailure, OperationFailure
+from .base import SEQUENCE_BATCH_SIZE, StorageBackend
+
+logger = logging.getLogger(__name__)
+
+# Per-user settings collections joined into a single profile read
+PROFILE_COLLECTIONS = ["rename_formats", "affixes", "captions", "thumbnails", "metadata", "media_formats", "sequences"]
+
+# Collections holding at most one document per user
+USER_COLLECTIONS = ["users", "thumbnails", "captions", "rename_formats", "affixes", "metadata", "media_formats", "sequences", "admins"]
+
+class MongoBackend(StorageBackend):
+    """MongoDB storage using the async motor driver"""
+    
+    name = "mongo"
+    
+    def __init__(self, db_url, db_name):
+        self.db_url = db_url
+        self.db_name = db_name
+        self.client = None
+        self.db = None
+    
+    async def connect(self):
+        """Connect to MongoDB"""
+        try:
+            self.client = AsyncIOMotorClient(self.db_url)
+            self.db = self.client[self.db_name]
+            await self.client.admin.command('ping')
+            logger.info("Connected to MongoDB successfully")
+            await self.ensure_indexes()
+            return True
+        except ConnectionFailure as e:
+            logger.error(f"Failed to connect to MongoDB: {e}")
+            return False
+    
+    async def ensure_indexes(self):
+        """Create the indexes the bot's queries rely on (idempotent)"""
+        indexes = [
+            (collection, [("user_id", ASCENDING)], {"unique": True})
+            for collection in USER_COLLECTIONS
+        ]
+        indexes += [
+            ("users", [("rename_count", DESCENDING)], {}),
+            ("users", [("is_banned", ASCENDING)], {"partialFilterExpression": {"is_banned": True}}),
+            ("users", [("ban_updated_at", ASCENDING)], {"sparse": True}),
+            ("sequence_files", [("user_id", ASCENDING), ("sequence_id", ASCENDING), ("seq", ASCENDING)], {"unique": True})
+        ]
+        
+        for collection, keys, options in indexes:
+            try:
+                name = await self.db[collection].create_index(keys, **options)
+                logger.info(f"Index ready: {collection}.{name}")
+            except OperationFailure as e:
+                logger.error(f"Failed to create index on {collection} {keys}: {e}")
+    
+    async def disconnect(self):
+        """Disconnect from MongoDB"""
+        if self.client:
+            self.client.close()
+            logger.info("Disconnected from MongoDB")
+    
+    # User operations
+    async def add_user(self, user_id, username=None, first_name=None):
+        """Add or update user in database"""
+        users = self.db["users"]
+        await users.update_one(
+            {"user_id": user_id},
+            {
+                "$set": {
+                    "username": username,
+                    "first_name": first_name,
+                    "joined_date": datetime.now()
+                },
+                "$setOnInsert": {
+                    "rename_count": 0,
+                    "is_banned": False
+                }
+            },
+            upsert=True
+        )
+    
+    async def get_user(self, user_id):
+        """Get user data"""
+        users = self.db["users"]
+        return await users.find_one({"user_id": user_id})
+    
+    async def add_rename_counts(self, counts):
+        """Add rename count increments with one unordered bulk_write"""
+        users = self.db["users"]
+        requests = [
+            UpdateOne(
+                {"user_id": user_id},
+                {
+                    "$inc": {"rename_count": count},
+                    "$setOnInsert": {"is_banned": False}
+                },
+                upsert=True
+            )
+            for user_id, count in counts
+        ]
+        
+        try:
+            await users.bulk_write(requests, ordered=False)
+        except BulkWriteError as e:
+            return [counts[error["index"]] for error in e.details.get("writeErrors", [])]
+        return []
+    
+    async def get_user_profile(self, user_id):
+        """Get ban flag and all rename settings of a user in one round-trip"""
+        users = self.db["users"]
+        match = {"$match": {"user_id": user_id}}
+        pipeline = [
+            match,
+            # Users who never sent /start have no users document yet
+            {"$unionWith": {"coll": "rename_formats", "pipeline": [match, {"$project": {"user_id": 1}}]}},
+            {"$limit": 1}
+        ]
+        for collection in PROFILE_COLLECTIONS:
+            pipeline.append({
+                "$lookup": {
+                    "from": collection,
+                    "localField": "user_id",
+                    "foreignField": "user_id",
+                    "as": collection
+                }
+            })
+        
+        results = await users.aggregate(pipeline).to_list(length=1)
+        document = results[0] if results else {}
+        
+        def joined(collection):
+            docs = document.get(collection) or []
+            if not docs:
+                return {}
+            docs[0].pop("_id", None)
+            return docs[0]
+        
+        affixes = joined("affixes")
+        return {
+            "user_id": user_id,
+            "is_banned": document.get("is_banned", False),
+            "rename_format": joined("rename_formats").get("format"),
+            "prefix": affixes.get("prefix"),
+            "suffix": affixes.get("suffix"),
+            "caption": joined("captions").get("caption"),
+            "thumbnail": joined("thumbnails") or None,
+            "metadata": joined("metadata") or None,
+            "media_format": joined("media_formats").get("format"),
+            "sequence_active": joined("sequences").get("is_active", False)
+        }
+    
+    # Thumbnail operations
+    async def set_thumbnail(self, user_id, file_id, file_unique_id):
+        """Set user's thumbnail"""
+        thumbnails = self.db["thumbnails"]
+        await thumbnails.update_one(
+            {"user_id": user_id},
+            {
+                "$set": {
+                    "file_id": file_id,
+                    "file_unique_id": file_unique_id,
+                    "updated_at": datetime.now()
+                }
+            },
+            upsert=True
+        )
+    
+    async def get_thumbnail(self, user_id):
+        """Get user's thumbnail"""
+        thumbnails = self.db["thumbnails"]
+        return await thumbnails.find_one({"user_id": user_id})
+    
+    async def delete_thumbnail(self, user_id):
+        """Delete user's thumbnail"""
+        thumbnails = self.db["thumbnails"]
+        await thumbnails.delete_one({"user_id": user_id})
+    
+    # Caption operations
+    async def set_caption(self, user_id, caption):
+        """Set user's custom caption"""
+        captions = self.db["captions"]
+        await captions.update_one(
+            {"user_id": user_id},
+            {
+                "$set": {
+                    "caption": caption,
+                    "updated_at": datetime.now()
+                }
+            },
+            upsert=True
+        )
+    
+    async def get_caption(self, user_id):
+        """Get user's custom caption"""
+        captions = self.db["captions"]
+        result = await captions.find_one({"user_id": user_id})
+        return result["caption"] if result else None
+    
+    async def delete_caption(self, user_id):
+        """Delete user's custom caption"""
+        captions = self.db["captions"]
+        await captions.delete_one({"user_id": user_id})
+    
+    # Rename format operations
+    async def set_rename_format(self, user_id, format_string):
+        """Set user's rename format"""
+        formats = self.db["rename_formats"]
+        await formats.update_one(
+            {"user_id": user_id},
+            {
+                "$set": {
+                    "format": format_string,
+                    "updated_at": datetime.now()
+                }
+            },
+            upsert=True
+        )
+    
+    async def get_rename_format(self, user_id):
+        """Get user's rename format"""
+        formats = self.db["rename_formats"]
+        result = await formats.find_one({"user_id": user_id})
+        return result["format"] if result else None
+    
+    # Prefix/Suffix operations
+    async def set_prefix(self, user_id, prefix):
+        """Set user's prefix"""
+        affixes = self.db["affixes"]
+        await affixes.update_one(
+            {"user_id": user_id},
+            {"$set": {"prefix": prefix}},
+            upsert=True
+        )
+    
+    async def get_prefix(self, user_id):
+        """Get user's prefix"""
+        affixes = self.db["affixes"]
+        result = await affixes.find_one({"user_id": user_id})
+        return result.get("prefix") if result else None
+    
+    async def set_suffix(self, user_id, suffix):
+        """Set user's suffix"""
+        affixes = self.db["affixes"]
+        await affixes.update_one(
+            {"user_id": user_id},
+            {"$set": {"suffix": suffix}},
+            upsert=True
+        )
+    
+    async def get_suffix(self, user_id):
+        """Get user's suffix"""
+        affixes = self.db["affixes"]
+        result = await affixes.find_one({"user_id": user_id})
+        return result.get("suffix") if result else None
+    
+    async def delete_prefix(self, user_id):
+        """Delete user's prefix"""
+        affixes = self.db["affixes"]
+        await affixes.update_one(
+            {"user_id": user_id},
+            {"$unset": {"prefix": ""}}
+        )
+    
+    async def delete_suffix(self, user_id):
+        """Delete user's suffix"""
+        affixes = self.db["affixes"]
+        await affixes.update_one(
+            {"user_id": user_id},
+            {"$unset": {"suffix": ""}}
+        )
+    
+    # Metadata operations
+    async def set_metadata(self, user_id, title=None, author=None):
+        """Set user's metadata"""
+        metadata = self.db["metadata"]
+        update_data = {"updated_at": datetime.now()}
+        if title:
+            update_data["title"] = title
+        if author:
+            update_data["author"] = author
+        
+        await metadata.update_one(
+            {"user_id": user_id},
+            {"$set": update_data},
+            upsert=True
+        )
+    
+    async def get_metadata(self, user_id):
+        """Get user's metadata"""
+        metadata = self.db["metadata"]
+        return await metadata.find_one({"user_id": user_id})
+    
+    async def delete_metadata(self, user_id):
+        """Delete user's metadata"""
+        metadata = self.db["metadata"]
+        await metadata.delete_one({"user_id": user_id})
+    
+    # Media format operations
+    async def set_media_format(self, user_id, media_format):
+        """Set user's output container, e.g. mp4 or mkv"""
+        media_formats = self.db["media_formats"]
+        await media_formats.update_one(
+            {"user_id": user_id},
+            {
+                "$set": {
+                    "format": media_format,
+                    "updated_at": datetime.now()
+                }
+            },
+            upsert=True
+        )
+    
+    async def get_media_format(self, user_id):
+        """Get user's output container"""
+        media_formats = self.db["media_formats"]
+        result = await media_formats.find_one({"user_id": user_id})
+        return result["format"] if result else None
+    
+    # Force subscribe channels
+    async def add_force_sub_channel(self, channel_username):
+        """Add channel to force subscribe list"""
+        channels = self.db["force_sub_channels"]
+        await channels.update_one(
+            {"username": channel_username},
+            {"$set": {"username": channel_username}},
+            upsert=True
+        )
+    
+    async def remove_force_sub_channel(self, channel_username):
+        """Remove channel from force subscribe list"""
+        channels = self.db["force_sub_channels"]
+        await channels.delete_one({"username": channel_username})
+    
+    async def get_all_force_sub_channels(self):
+        """Get all force subscribe channels"""
+        channels = self.db["force_sub_channels"]
+        return await channels.find({}, {"_id": 0}).to_list(length=None)
+    
+    # Ban operations
+    async def set_banned(self, user_id, banned, updated_at):
+        """Set user's ban flag"""
+        users = self.db["users"]
+        await users.update_one(
+            {"user_id": user_id},
+            {"$set": {"is_banned": banned, "ban_updated_at": updated_at}},
+            upsert=banned
+        )
+    
+    async def get_banned_user_ids(self):
+        """Get IDs of all banned users"""
+        users = self.db["users"]
+        cursor = users.find({"is_banned": True}, {"_id": 0, "user_id": 1})
+        return [doc["user_id"] async for doc in cursor]
+    
+    async def get_ban_changes(self, since):
+        """Get users whose ban flag changed since a time"""
+        users = self.db["users"]
+        cursor = users.find(
+            {"ban_updated_at": {"$gte": since}},
+            {"_id": 0, "user_id": 1, "is_banned": 1}
+        )
+        return await cursor.to_list(length=None)
+    
+    async def get_banned_users(self):
+        """Get all banned users"""
+        users = self.db["users"]
+        return await users.find({"is_banned": True}).to_list(length=None)
+    
+    # Admin operations
+    async def add_admin(self, user_id, added_at):
+        """Add an admin"""
+        admins = self.db["admins"]
+        await admins.update_one(
+            {"user_id": user_id},
+            {"$set": {"user_id": user_id, "added_at": added_at}},
+            upsert=True
+        )
+    
+    async def remove_admin(self, user_id):
+        """Remove an admin"""
+        admins = self.db["admins"]
+        await admins.delete_one({"user_id": user_id})
+    
+    async def get_all_admins(self):
+        """Get all admins"""
+        admins = self.db["admins"]
+        return await admins.find({}, {"_id": 0}).to_list(length=None)
+    
+    # Leaderboard operations
+    async def get_leaderboard(self, limit=10):
+        """Get top users by rename count"""
+        users = self.db["users"]
+        return await users.find({}, {"_id": 0}).sort("rename_count", -1).to_list(length=limit)
+    
+    async def get_user_rank(self, user_id):
+        """Get user's leaderboard position and rename count"""
+        users = self.db["users"]
+        user = await users.find_one({"user_id": user_id}, {"_id": 0, "rename_count": 1})
+        if not user:
+            return None
+        
+        rename_count = user.get("rename_count", 0)
+        higher = await users.count_documents({"rename_count": {"$gt": rename_count}})
+        return {"rank": higher + 1, "rename_count": rename_count}
+    
+    # Sequence mode operations
+    async def start_sequence(self, user_id):
+        """Start file sequence mode for user"""
+        sequences = self.db["sequences"]
+        previous = await sequences.find_one_and_update(
+            {"user_id": user_id},
+            {
+                "$set": {
+                    "is_active": True,
+                    "file_count": 0,
+                    "started_at": datetime.now()
+                },
+                "$inc": {"sequence_id": 1},
+                "$unset": {"files": ""}
+            },
+            projection={"_id": 0, "sequence_id": 1, "is_active": 1},
+            upsert=True,
+            return_document=ReturnDocument.BEFORE
+        )
+        # An ended sequence's files belong to its job, which clears them when done
+        if previous and previous.get("is_active"):
+            await self.clear_sequence(user_id, previous.get("sequence_id", 0))
+    
+    async def add_to_sequence(self, user_id, file_data):
+        """Add file to sequence as its own record"""
+        sequences = self.db["sequences"]
+        sequence = await sequences.find_one_and_update(
+            {"user_id": user_id, "is_active": True},
+            {"$inc": {"file_count": 1}},
+            projection={"_id": 0, "sequence_id": 1, "file_count": 1},
+            return_document=ReturnDocument.AFTER
+        )
+        if not sequence:
+            return None
+        
+        seq = sequence["file_count"]
+        await self.db["sequence_files"].insert_one({
+            "user_id": user_id,
+            "sequence_id": sequence["sequence_id"],
+            "seq": seq,
+            "file": file_data,
+            "added_at": datetime.now()
+        })
+        return seq
+    
+    async def end_sequence(self, user_id):
+        """End file sequence mode for user"""
+        sequences = self.db["sequences"]
+        sequence = await sequences.find_one_and_update(
+            {"user_id": user_id, "is_active": True},
+            {"$set": {"is_active": False}},
+            projection={"_id": 0, "sequence_id": 1, "file_count": 1}
+        )
+        if not sequence:
+            return None, 0
+        return sequence["sequence_id"], sequence["file_count"]
+    
+    async def iter_sequence(self, user_id, sequence_id):
+        """Stream the sequence's files in order, a batch per query"""
+        last_seq = -1
+        while True:
+            docs = await self.db["sequence_files"].find(
+                {"user_id": user_id, "sequence_id": sequence_id, "seq": {"$gt": last_seq}},
+                {"_id": 0, "seq": 1, "file": 1}
+            ).sort("seq", ASCENDING).limit(SEQUENCE_BATCH_SIZE).to_list(SEQUENCE_BATCH_SIZE)
+            for doc in docs:
+                yield doc["file"]
+            if len(docs) < SEQUENCE_BATCH_SIZE:
+                break
+            last_seq = docs[-1]["seq"]
+    
+    async def clear_sequence(self, user_id, sequence_id):
+        """Delete the sequence's files"""
+        await self.db["sequence_files"].delete_many({"user_id": user_id, "sequence_id": sequence_id})
+    
+    async def is_sequence_active(self, user_id):
+        """Check if user has active sequence mode"""
+        sequences = self.db["sequences"]
+        result = await sequences.find_one({"user_id": user_id})
+        return result.get("is_active", False) if result else False
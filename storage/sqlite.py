@@ -0,0 +1,460 @@
+import json
+import logging
+import sqlite3
+from datetime import datetime
+from .base import SEQUENCE_BATCH_SIZE, StorageBackend
+
+logger = logging.getLogger(__name__)
+
+sqlite3.register_adapter(datetime, lambda value: value.isoformat(" "))
+sqlite3.register_converter("TIMESTAMP", lambda value: datetime.fromisoformat(value.decode()))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    user_id INTEGER PRIMARY KEY,
+    username TEXT,
+    first_name TEXT,
+    joined_date TIMESTAMP,
+    rename_count INTEGER NOT NULL DEFAULT 0,
+    is_banned INTEGER NOT NULL DEFAULT 0,
+    ban_updated_at TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_users_rename_count ON users (rename_count DESC);
+CREATE INDEX IF NOT EXISTS idx_users_banned ON users (user_id) WHERE is_banned = 1;
+CREATE INDEX IF NOT EXISTS idx_users_ban_updated_at ON users (ban_updated_at) WHERE ban_updated_at IS NOT NULL;
+
+CREATE TABLE IF NOT EXISTS thumbnails (
+    user_id INTEGER PRIMARY KEY,
+    file_id TEXT,
+    file_unique_id TEXT,
+    updated_at TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS captions (
+    user_id INTEGER PRIMARY KEY,
+    caption TEXT,
+    updated_at TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS rename_formats (
+    user_id INTEGER PRIMARY KEY,
+    format TEXT,
+    updated_at TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS affixes (
+    user_id INTEGER PRIMARY KEY,
+    prefix TEXT,
+    suffix TEXT
+);
+CREATE TABLE IF NOT EXISTS metadata (
+    user_id INTEGER PRIMARY KEY,
+    title TEXT,
+    author TEXT,
+    updated_at TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS media_formats (
+    user_id INTEGER PRIMARY KEY,
+    format TEXT,
+    updated_at TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS force_sub_channels (
+    username TEXT PRIMARY KEY
+);
+CREATE TABLE IF NOT EXISTS admins (
+    user_id INTEGER PRIMARY KEY,
+    added_at TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS sequences (
+    user_id INTEGER PRIMARY KEY,
+    sequence_id INTEGER NOT NULL DEFAULT 0,
+    is_active INTEGER NOT NULL DEFAULT 0,
+    file_count INTEGER NOT NULL DEFAULT 0,
+    started_at TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS sequence_files (
+    user_id INTEGER NOT NULL,
+    sequence_id INTEGER NOT NULL,
+    seq INTEGER NOT NULL,
+    file TEXT NOT NULL,
+    added_at TIMESTAMP,
+    PRIMARY KEY (user_id, sequence_id, seq)
+) WITHOUT ROWID;
+"""
+
+PROFILE_QUERY = """
+SELECT u.is_banned, f.format, a.prefix, a.suffix, c.caption,
+       t.file_id, t.file_unique_id, t.updated_at AS thumb_updated_at,
+       m.title, m.author, m.updated_at AS meta_updated_at,
+       m.user_id AS meta_user_id, mf.format AS media_format, s.is_active AS sequence_active
+FROM (SELECT ? AS user_id) AS k
+LEFT JOIN users u ON u.user_id = k.user_id
+LEFT JOIN rename_formats f ON f.user_id = k.user_id
+LEFT JOIN affixes a ON a.user_id = k.user_id
+LEFT JOIN captions c ON c.user_id = k.user_id
+LEFT JOIN thumbnails t ON t.user_id = k.user_id
+LEFT JOIN metadata m ON m.user_id = k.user_id
+LEFT JOIN media_formats mf ON mf.user_id = k.user_id
+LEFT JOIN sequences s ON s.user_id = k.user_id
+"""
+
+class SQLiteBackend(StorageBackend):
+    """Embedded SQLite storage in WAL mode for single-node installs
+
+    Queries run inline on the event loop: indexed point reads on a local
+    WAL database take microseconds, less than a hop to an executor.
+    """
+    
+    name = "sqlite"
+    
+    def __init__(self, path):
+        self.path = path
+        self.conn = None
+    
+    async def connect(self):
+        """Open the database file and create tables and indexes"""
+        try:
+            self.conn = sqlite3.connect(
+                self.path,
+                detect_types=sqlite3.PARSE_DECLTYPES,
+                isolation_level=None
+            )
+            self.conn.row_factory = sqlite3.Row
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            self.conn.executescript(SCHEMA)
+            logger.info(f"Opened SQLite database {self.path}")
+            return True
+        except sqlite3.Error as e:
+            logger.error(f"Failed to open SQLite database {self.path}: {e}")
+            return False
+    
+    async def disconnect(self):
+        """Close the database file"""
+        if self.conn:
+            self.conn.close()
+            self.conn = None
+            logger.info("Closed SQLite database")
+    
+    def _fetch_one(self, query, *params):
+        row = self.conn.execute(query, params).fetchone()
+        return dict(row) if row else None
+    
+    def _fetch_all(self, query, *params):
+        return [dict(row) for row in self.conn.execute(query, params)]
+    
+    def _fetch_value(self, query, *params):
+        row = self.conn.execute(query, params).fetchone()
+        return row[0] if row else None
+    
+    @staticmethod
+    def _user(row):
+        if row:
+            row["is_banned"] = bool(row["is_banned"])
+        return row
+    
+    # User operations
+    async def add_user(self, user_id, username=None, first_name=None):
+        """Add or update user"""
+        self.conn.execute(
+            """INSERT INTO users (user_id, username, first_name, joined_date) VALUES (?, ?, ?, ?)
+               ON CONFLICT(user_id) DO UPDATE SET
+                   username = excluded.username,
+                   first_name = excluded.first_name,
+                   joined_date = excluded.joined_date""",
+            (user_id, username, first_name, datetime.now())
+        )
+    
+    async def get_user(self, user_id):
+        """Get user data"""
+        return self._user(self._fetch_one("SELECT * FROM users WHERE user_id = ?", user_id))
+    
+    async def add_rename_counts(self, counts):
+        """Add rename count increments in one transaction"""
+        with self.conn:
+            self.conn.execute("BEGIN")
+            self.conn.executemany(
+                """INSERT INTO users (user_id, rename_count) VALUES (?, ?)
+                   ON CONFLICT(user_id) DO UPDATE SET rename_count = rename_count + excluded.rename_count""",
+                counts
+            )
+        return []
+    
+    async def get_user_profile(self, user_id):
+        """Get ban flag and all rename settings of a user in one query"""
+        row = self._fetch_one(PROFILE_QUERY, user_id)
+        thumbnail = None
+        if row["file_id"]:
+            thumbnail = {
+                "user_id": user_id,
+                "file_id": row["file_id"],
+                "file_unique_id": row["file_unique_id"],
+                "updated_at": row["thumb_updated_at"]
+            }
+        metadata = None
+        if row["meta_user_id"] is not None:
+            metadata = {"user_id": user_id, "updated_at": row["meta_updated_at"]}
+            metadata.update({key: row[key] for key in ("title", "author") if row[key] is not None})
+        
+        return {
+            "user_id": user_id,
+            "is_banned": bool(row["is_banned"]),
+            "rename_format": row["format"],
+            "prefix": row["prefix"],
+            "suffix": row["suffix"],
+            "caption": row["caption"],
+            "thumbnail": thumbnail,
+            "metadata": metadata,
+            "media_format": row["media_format"],
+            "sequence_active": bool(row["sequence_active"])
+        }
+    
+    # Thumbnail operations
+    async def set_thumbnail(self, user_id, file_id, file_unique_id):
+        """Set user's thumbnail"""
+        self.conn.execute(
+            "INSERT OR REPLACE INTO thumbnails (user_id, file_id, file_unique_id, updated_at) VALUES (?, ?, ?, ?)",
+            (user_id, file_id, file_unique_id, datetime.now())
+        )
+    
+    async def get_thumbnail(self, user_id):
+        """Get user's thumbnail"""
+        return self._fetch_one("SELECT * FROM thumbnails WHERE user_id = ?", user_id)
+    
+    async def delete_thumbnail(self, user_id):
+        """Delete user's thumbnail"""
+        self.conn.execute("DELETE FROM thumbnails WHERE user_id = ?", (user_id,))
+    
+    # Caption operations
+    async def set_caption(self, user_id, caption):
+        """Set user's custom caption"""
+        self.conn.execute(
+            "INSERT OR REPLACE INTO captions (user_id, caption, updated_at) VALUES (?, ?, ?)",
+            (user_id, caption, datetime.now())
+        )
+    
+    async def get_caption(self, user_id):
+        """Get user's custom caption"""
+        return self._fetch_value("SELECT caption FROM captions WHERE user_id = ?", user_id)
+    
+    async def delete_caption(self, user_id):
+        """Delete user's custom caption"""
+        self.conn.execute("DELETE FROM captions WHERE user_id = ?", (user_id,))
+    
+    # Rename format operations
+    async def set_rename_format(self, user_id, format_string):
+        """Set user's rename format"""
+        self.conn.execute(
+            "INSERT OR REPLACE INTO rename_formats (user_id, format, updated_at) VALUES (?, ?, ?)",
+            (user_id, format_string, datetime.now())
+        )
+    
+    async def get_rename_format(self, user_id):
+        """Get user's rename format"""
+        return self._fetch_value("SELECT format FROM rename_formats WHERE user_id = ?", user_id)
+    
+    # Prefix/Suffix operations
+    async def set_prefix(self, user_id, prefix):
+        """Set user's prefix"""
+        self.conn.execute(
+            "INSERT INTO affixes (user_id, prefix) VALUES (?, ?) ON CONFLICT(user_id) DO UPDATE SET prefix = excluded.prefix",
+            (user_id, prefix)
+        )
+    
+    async def get_prefix(self, user_id):
+        """Get user's prefix"""
+        return self._fetch_value("SELECT prefix FROM affixes WHERE user_id = ?", user_id)
+    
+    async def set_suffix(self, user_id, suffix):
+        """Set user's suffix"""
+        self.conn.execute(
+            "INSERT INTO affixes (user_id, suffix) VALUES (?, ?) ON CONFLICT(user_id) DO UPDATE SET suffix = excluded.suffix",
+            (user_id, suffix)
+        )
+    
+    async def get_suffix(self, user_id):
+        """Get user's suffix"""
+        return self._fetch_value("SELECT suffix FROM affixes WHERE user_id = ?", user_id)
+    
+    async def delete_prefix(self, user_id):
+        """Delete user's prefix"""
+        self.conn.execute("UPDATE affixes SET prefix = NULL WHERE user_id = ?", (user_id,))
+    
+    async def delete_suffix(self, user_id):
+        """Delete user's suffix"""
+        self.conn.execute("UPDATE affixes SET suffix = NULL WHERE user_id = ?", (user_id,))
+    
+    # Metadata operations
+    async def set_metadata(self, user_id, title=None, author=None):
+        """Set user's metadata"""
+        self.conn.execute(
+            """INSERT INTO metadata (user_id, title, author, updated_at) VALUES (?, ?, ?, ?)
+               ON CONFLICT(user_id) DO UPDATE SET
+                   title = COALESCE(excluded.title, title),
+                   author = COALESCE(excluded.author, author),
+                   updated_at = excluded.updated_at""",
+            (user_id, title or None, author or None, datetime.now())
+        )
+    
+    async def get_metadata(self, user_id):
+        """Get user's metadata"""
+        row = self._fetch_one("SELECT * FROM metadata WHERE user_id = ?", user_id)
+        return {key: value for key, value in row.items() if value is not None} if row else None
+    
+    async def delete_metadata(self, user_id):
+        """Delete user's metadata"""
+        self.conn.execute("DELETE FROM metadata WHERE user_id = ?", (user_id,))
+    
+    # Media format operations
+    async def set_media_format(self, user_id, media_format):
+        """Set user's output container, e.g. mp4 or mkv"""
+        self.conn.execute(
+            "INSERT OR REPLACE INTO media_formats (user_id, format, updated_at) VALUES (?, ?, ?)",
+            (user_id, media_format, datetime.now())
+        )
+    
+    async def get_media_format(self, user_id):
+        """Get user's output container"""
+        return self._fetch_value("SELECT format FROM media_formats WHERE user_id = ?", user_id)
+    
+    # Force subscribe channels
+    async def add_force_sub_channel(self, channel_username):
+        """Add channel to force subscribe list"""
+        self.conn.execute("INSERT OR IGNORE INTO force_sub_channels (username) VALUES (?)", (channel_username,))
+    
+    async def remove_force_sub_channel(self, channel_username):
+        """Remove channel from force subscribe list"""
+        self.conn.execute("DELETE FROM force_sub_channels WHERE username = ?", (channel_username,))
+    
+    async def get_all_force_sub_channels(self):
+        """Get all force subscribe channels"""
+        return self._fetch_all("SELECT username FROM force_sub_channels")
+    
+    # Ban operations
+    async def set_banned(self, user_id, banned, updated_at):
+        """Set user's ban flag"""
+        if banned:
+            self.conn.execute(
+                """INSERT INTO users (user_id, is_banned, ban_updated_at) VALUES (?, 1, ?)
+                   ON CONFLICT(user_id) DO UPDATE SET is_banned = 1, ban_updated_at = excluded.ban_updated_at""",
+                (user_id, updated_at)
+            )
+        else:
+            self.conn.execute(
+                "UPDATE users SET is_banned = 0, ban_updated_at = ? WHERE user_id = ?",
+                (updated_at, user_id)
+            )
+    
+    async def get_banned_user_ids(self):
+        """Get IDs of all banned users"""
+        return [row[0] for row in self.conn.execute("SELECT user_id FROM users WHERE is_banned = 1")]
+    
+    async def get_ban_changes(self, since):
+        """Get users whose ban flag changed since a time"""
+        return [
+            {"user_id": row["user_id"], "is_banned": bool(row["is_banned"])}
+            for row in self.conn.execute(
+                "SELECT user_id, is_banned FROM users WHERE ban_updated_at >= ?", (since,)
+            )
+        ]
+    
+    async def get_banned_users(self):
+        """Get all banned users"""
+        return [self._user(row) for row in self._fetch_all("SELECT * FROM users WHERE is_banned = 1")]
+    
+    # Admin operations
+    async def add_admin(self, user_id, added_at):
+        """Add an admin"""
+        self.conn.execute("INSERT OR REPLACE INTO admins (user_id, added_at) VALUES (?, ?)", (user_id, added_at))
+    
+    async def remove_admin(self, user_id):
+        """Remove an admin"""
+        self.conn.execute("DELETE FROM admins WHERE user_id = ?", (user_id,))
+    
+    async def get_all_admins(self):
+        """Get all admins"""
+        return self._fetch_all("SELECT * FROM admins")
+    
+    # Leaderboard operations
+    async def get_leaderboard(self, limit=10):
+        """Get top users by rename count"""
+        rows = self._fetch_all("SELECT * FROM users ORDER BY rename_count DESC LIMIT ?", limit)
+        return [self._user(row) for row in rows]
+    
+    async def get_user_rank(self, user_id):
+        """Get user's leaderboard position and rename count"""
+        rename_count = self._fetch_value("SELECT rename_count FROM users WHERE user_id = ?", user_id)
+        if rename_count is None:
+            return None
+        
+        higher = self._fetch_value("SELECT COUNT(*) FROM users WHERE rename_count > ?", rename_count)
+        return {"rank": higher + 1, "rename_count": rename_count}
+    
+    # Sequence mode operations
+    async def start_sequence(self, user_id):
+        """Start file sequence mode for user"""
+        with self.conn:
+            self.conn.execute("BEGIN")
+            # An ended sequence's files belong to its job, which clears them when done
+            self.conn.execute(
+                "DELETE FROM sequence_files WHERE user_id = ? AND sequence_id = "
+                "(SELECT sequence_id FROM sequences WHERE user_id = ? AND is_active = 1)",
+                (user_id, user_id)
+            )
+            self.conn.execute(
+                "INSERT INTO sequences (user_id, sequence_id, is_active, file_count, started_at) VALUES (?, 1, 1, 0, ?) "
+                "ON CONFLICT (user_id) DO UPDATE SET sequence_id = sequence_id + 1, is_active = 1, file_count = 0, "
+                "started_at = excluded.started_at",
+                (user_id, datetime.now())
+            )
+    
+    async def add_to_sequence(self, user_id, file_data):
+        """Add file to sequence as its own row"""
+        with self.conn:
+            self.conn.execute("BEGIN")
+            sequence = self._fetch_one(
+                "UPDATE sequences SET file_count = file_count + 1 WHERE user_id = ? AND is_active = 1 "
+                "RETURNING sequence_id, file_count",
+                user_id
+            )
+            if sequence is None:
+                return None
+            seq = sequence["file_count"]
+            self.conn.execute(
+                "INSERT INTO sequence_files (user_id, sequence_id, seq, file, added_at) VALUES (?, ?, ?, ?, ?)",
+                (user_id, sequence["sequence_id"], seq, json.dumps(file_data), datetime.now())
+            )
+        return seq
+    
+    async def end_sequence(self, user_id):
+        """End file sequence mode for user"""
+        sequence = self._fetch_one(
+            "UPDATE sequences SET is_active = 0 WHERE user_id = ? AND is_active = 1 RETURNING sequence_id, file_count",
+            user_id
+        )
+        if sequence is None:
+            return None, 0
+        return sequence["sequence_id"], sequence["file_count"]
+    
+    async def iter_sequence(self, user_id, sequence_id):
+        """Stream the sequence's files in order, a batch per query"""
+        last_seq = -1
+        while True:
+            rows = self.conn.execute(
+                "SELECT seq, file FROM sequence_files WHERE user_id = ? AND sequence_id = ? AND seq > ? "
+                "ORDER BY seq LIMIT ?",
+                (user_id, sequence_id, last_seq, SEQUENCE_BATCH_SIZE)
+            ).fetchall()
+            for _, file_data in rows:
+                yield json.loads(file_data)
+            if len(rows) < SEQUENCE_BATCH_SIZE:
+                break
+            last_seq = rows[-1][0]
+    
+    async def clear_sequence(self, user_id, sequence_id):
+        """Delete the sequence's files"""
+        self.conn.execute(
+            "DELETE FROM sequence_files WHERE user_id = ? AND sequence_id = ?",
+            (user_id, sequence_id)
+        )
+    
+    async def is_sequence_active(self, user_id):
+        """Check if user has active sequence mode"""
+        return bool(self._fetch_value("SELECT is_active FROM sequences WHERE user_id = ?", user_id))
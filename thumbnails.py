@@ -0,0 +1,150 @@
+import asyncio
+import io
+import logging
+import os
+from collections import OrderedDict
+from PIL import Image
+from process_pool import process_pool
+from media_pipeline import media_pipeline
+from config import THUMBNAIL_WIDTH, THUMBNAIL_HEIGHT, THUMBNAIL_QUALITY, THUMBNAIL_CACHE_DIR, THUMBNAIL_CACHE_SIZE
+
+logger = logging.getLogger(__name__)
+
+# Videos remembered as having no frame to extract
+NO_FRAME_CACHE_SIZE = 1000
+
+def resize_thumbnail(data: bytes, width=THUMBNAIL_WIDTH, height=THUMBNAIL_HEIGHT, quality=THUMBNAIL_QUALITY) -> bytes:
+    """Shrink an image to fit width x height and compress it as JPEG"""
+    with Image.open(io.BytesIO(data)) as image:
+        image = image.convert("RGB")
+        image.thumbnail((width, height))
+        output = io.BytesIO()
+        image.save(output, "JPEG", quality=quality, optimize=True)
+    return output.getvalue()
+
+class ThumbnailCache:
+    """Resized thumbnails on disk, keyed by the source's file_unique_id
+
+    Each photo, or video frame for automatic thumbnails, is fetched and
+    resized once, then reused for every rename that uses it. The
+    directory is kept under max_bytes by evicting the least recently
+    used thumbnails. Resizing runs in the process pool.
+    """
+    
+    def __init__(self, directory=THUMBNAIL_CACHE_DIR, max_bytes=THUMBNAIL_CACHE_SIZE):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._locks = {}
+        self.no_frame = OrderedDict()
+        self._loaded = False
+    
+    def path(self, file_unique_id):
+        """Path of the cached thumbnail for a photo"""
+        return os.path.join(self.directory, f"{file_unique_id}.jpg")
+    
+    def _load(self):
+        """Index thumbnails left from earlier runs, oldest use first"""
+        os.makedirs(self.directory, exist_ok=True)
+        files = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and entry.name.endswith(".jpg"):
+                stat = entry.stat()
+                files.append((stat.st_mtime, entry.name[:-4], stat.st_size))
+        for _, file_unique_id, size in sorted(files):
+            self.entries[file_unique_id] = size
+            self.total_bytes += size
+        self._loaded = True
+        self._evict()
+    
+    def _evict(self):
+        while self.total_bytes > self.max_bytes and len(self.entries) > 1:
+            file_unique_id, size = self.entries.popitem(last=False)
+            self.total_bytes -= size
+            try:
+                os.remove(self.path(file_unique_id))
+            except OSError as e:
+                logger.error(f"Error evicting thumbnail {file_unique_id}: {e}")
+    
+    def _touch(self, file_unique_id):
+        self.entries.move_to_end(file_unique_id)
+        # mtime records use across restarts
+        try:
+            os.utime(self.path(file_unique_id))
+        except OSError:
+            pass
+    
+    async def _get(self, file_unique_id, fetch):
+        """Get the path of a cached thumbnail, making it from await fetch() on a miss"""
+        if not self._loaded:
+            self._load()
+        
+        if file_unique_id in self.entries:
+            self.hits += 1
+            self._touch(file_unique_id)
+            return self.path(file_unique_id)
+        
+        # One download per file even when several renames ask at once
+        lock = self._locks.setdefault(file_unique_id, asyncio.Lock())
+        try:
+            async with lock:
+                if file_unique_id in self.entries:
+                    self.hits += 1
+                    self._touch(file_unique_id)
+                    return self.path(file_unique_id)
+                
+                self.misses += 1
+                image = await fetch()
+                if image is None:
+                    return None
+                data = await process_pool.run(resize_thumbnail, image)
+                
+                # Write then rename so a crash never leaves a partial thumbnail
+                path = self.path(file_unique_id)
+                with open(path + ".tmp", "wb") as f:
+                    f.write(data)
+                os.replace(path + ".tmp", path)
+                
+                self.entries[file_unique_id] = len(data)
+                self.total_bytes += len(data)
+                self._evict()
+                return path
+        finally:
+            self._locks.pop(file_unique_id, None)
+    
+    async def get(self, app, file_id, file_unique_id):
+        """Get the path of a photo's resized thumbnail, downloading it on first use"""
+        async def fetch():
+            photo = await app.download_media(file_id, in_memory=True)
+            return photo.getvalue()
+        return await self._get(file_unique_id, fetch)
+    
+    async def get_frame(self, app, file_data: dict):
+        """Get the path of a thumbnail taken from a video frame, None if it has none"""
+        file_unique_id = file_data["file_unique_id"]
+        if file_unique_id in self.no_frame:
+            return None
+        
+        frame = await self._get(file_unique_id, lambda: media_pipeline.extract_frame(app, file_data))
+        if frame is None:
+            # Remember videos without a usable frame so they aren't fetched again
+            self.no_frame[file_unique_id] = True
+            if len(self.no_frame) > NO_FRAME_CACHE_SIZE:
+                self.no_frame.popitem(last=False)
+        return frame
+    
+    def stats(self):
+        """Get size and hit/miss counters"""
+        return {
+            "files": len(self.entries),
+            "bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+# Initialize thumbnail cache instance
+thumbnails = ThumbnailCache()
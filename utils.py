@@ -6,19 +6,21 @@ from pyrogram import Client
 from pyrogram.types import Message
 from config import OWNER_ID, LOG_CHANNEL
 from database import db
+from log_sender import log_sender
+from rename_template import compile_format
 
 logger = logging.getLogger(__name__)
 
+INVALID_FILENAME_CHARS_RE = re.compile(r'[<>:"/\\|?*]')
+WHITESPACE_RE = re.compile(r'\s+')
+
 async def send_log(app: Client, message: str, user_id: int = None):
-    """Send a log message to log channel"""
-    try:
-        if LOG_CHANNEL:
-            text = f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}]\n{message}"
-            if user_id:
-                text += f"\n\nUser ID: {user_id}"
-            await app.send_message(LOG_CHANNEL, text)
-    except Exception as e:
-        logger.error(f"Error sending log: {e}")
+    """Queue a log message for the log channel; it is sent in the background"""
+    if LOG_CHANNEL:
+        text = f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}]\n{message}"
+        if user_id:
+            text += f"\n\nUser ID: {user_id}"
+        log_sender.enqueue(app, text)
 
 async def is_admin(app: Client, user_id: int) -> bool:
     """Check if user is admin"""
@@ -31,9 +33,9 @@ async def check_user_ban(user_id: int) -> bool:
 def sanitize_filename(filename: str) -> str:
     """Sanitize filename to be safe for file system"""
     # Remove invalid characters
-    filename = re.sub(r'[<>:"/\\|?*]', '_', filename)
+    filename = INVALID_FILENAME_CHARS_RE.sub('_', filename)
     # Remove multiple spaces
-    filename = re.sub(r'\s+', ' ', filename)
+    filename = WHITESPACE_RE.sub(' ', filename)
     # Limit length
     name, ext = os.path.splitext(filename)
     if len(name) > 100:
@@ -42,21 +44,7 @@ def sanitize_filename(filename: str) -> str:
 
 def parse_rename_format(format_string: str, **kwargs) -> str:
     """Parse rename format with variables"""
-    result = format_string
-    
-    # Replace variables
-    replacements = {
-        '{season}': str(kwargs.get('season', '')),
-        '{episode}': str(kwargs.get('episode', '')),
-        '{title}': str(kwargs.get('title', '')),
-        '{quality}': str(kwargs.get('quality', '')),
-        '{audio}': str(kwargs.get('audio', '')),
-    }
-    
-    for key, value in replacements.items():
-        result = result.replace(key, value)
-    
-    return sanitize_filename(result)
+    return sanitize_filename(compile_format(format_string).render(kwargs))
 
 def get_file_extension(filename: str) -> str:
     """Get file extension"""
@@ -91,29 +79,6 @@ def validate_token(token: str) -> bool:
     """Validate if string looks like a valid token"""
     return len(token) > 20
 
-async def delete_file(file_path: str):
-    """Safely delete a file"""
-    try:
-        if os.path.exists(file_path):
-            os.remove(file_path)
-            logger.info(f"Deleted file: {file_path}")
-    except Exception as e:
-        logger.error(f"Error deleting file {file_path}: {e}")
-
-def get_file_info(file_path: str) -> dict:
-    """Get file information"""
-    try:
-        stat_info = os.stat(file_path)
-        return {
-            'size': stat_info.st_size,
-            'created': datetime.fromtimestamp(stat_info.st_ctime),
-            'modified': datetime.fromtimestamp(stat_info.st_mtime),
-            'name': os.path.basename(file_path)
-        }
-    except Exception as e:
-        logger.error(f"Error getting file info: {e}")
-        return {}
-
 def split_text(text: str, max_length: int = 4096) -> list:
     """Split text into chunks to fit Telegram limit"""
     chunks = []